@@ -9,7 +9,7 @@ import time
 from os import path
 
 import pandas as pd
-from sqlalchemy import create_engine, select, MetaData, Table, text, inspect
+from sqlalchemy import create_engine, select, Column, MetaData, Table, text, inspect
 
 from src import AbbrsInfo
 from src.AddresInfo import Address
@@ -134,9 +134,8 @@ def process(addres: str, exceptions_manager=None) -> tuple[Address, Any | None,
     
     # Если адрес не найден в исключениях или произошла ошибка, ищем в справочнике
     try:
-        # Создаем временный объект ImprovedDatabaseOutputWorker для расширения адреса
-        temp_worker = ImprovedDatabaseOutputWorker(None, None, None, None)
-        expanded_address = temp_worker._expand_address_with_rules(raw)
+        # Правила расширения не зависят от подключения к БД, поэтому объект обработчика не создается
+        expanded_address = ImprovedDatabaseOutputWorker._expand_address_with_rules(raw)
         
         addr = Address.fromStr(expanded_address)
         key = linker.link(addr, require_flat_check=True)
@@ -182,11 +181,16 @@ def process_excel(input_path: str, input_sheet: str, address_name: str, output_p
         
         def parse():
             nonlocal total_processed
-            # Преобразуем DataFrame в список для более быстрой обработки
-            data_list = input_file.to_dict('records')
-            total_rows = len(data_list)
+            # Колонки читаются по порядку значений (tolist дает обычные типы Python),
+            # без построения словаря на каждую строку
+            raw_values = input_file[address_name].tolist()
+            id_values = input_file[identity_column_name].tolist() if identity_column_name is not None else None
             
-            for i, row in enumerate(data_list, 1):
+            # Повторяющиеся адреса обрабатываются один раз: результат разбора и поиска в справочнике
+            # переиспользуется для всех строк с тем же значением (статистика по-прежнему считается по строкам)
+            processed = {}
+            
+            for i, raw in enumerate(raw_values, 1):
                 if progress_callback and i % batch_size == 0:
                     progress_callback(i)
                 
@@ -197,12 +201,17 @@ def process_excel(input_path: str, input_sheet: str, address_name: str, output_p
                     'note': None
                 }
 
-                if identity_column_name is not None:
-                    data[identity_column_name] = row[identity_column_name]
+                if id_values is not None:
+                    data[identity_column_name] = id_values[i - 1]
                 
-                data['raw'] = row[address_name]
+                data['raw'] = raw
                 try:
-                    data['address'], data['key'], message = process(data['raw'], exceptions_manager)
+                    result = processed.get(raw) if type(raw) is str else None
+                    if result is None:
+                        result = process(raw, exceptions_manager)
+                        if type(raw) is str:
+                            processed[raw] = result
+                    data['address'], data['key'], message = result
                     if message == "Адрес не существует":
                         data['note'] = message
                         stats.add_unprocessed(data['raw'], Exception(message))
@@ -241,7 +250,14 @@ def make_engine(dbms: str, user: str, password: str, host: str, port: str, db_na
     }
     
     url = "{0}://{1}:{2}@{3}:{4}/{5}".format(dbms_cases[dbms], user, password, host, port, db_name)
-    engine = create_engine(url, pool_pre_ping=True)
+    engine_options = {'pool_pre_ping': True, 'insertmanyvalues_page_size': 1000}
+    if dbms == "PostgreSQL":
+        # Пакетные UPDATE/DELETE через execute_batch, INSERT - многострочными VALUES
+        engine_options['executemany_mode'] = 'values_plus_batch'
+    elif dbms == "MSSQL Server":
+        # pyodbc передает пакет параметров на сервер одним массивом (bulk-вставка драйвера)
+        engine_options['fast_executemany'] = True
+    engine = create_engine(url, **engine_options)
     with engine.connect():
         return engine
 
@@ -275,14 +291,18 @@ def process_db(dbms: str, user: str, password: str, host: str, port: str, db_nam
                 actual_table_name = table
                 break
         
-        table = Table(actual_table_name, metadata, autoload_with=engine)
+        # Для выборки нужны только имена колонок: тем же инспектором получаем их одним запросом,
+        # без полного отражения таблицы (ключи, индексы, ограничения)
+        column_names = [c['name'] for c in inspector.get_columns(actual_table_name, schema=schema)]
         
         # Проверяем наличие нужных колонок
-        if address_column not in [c.name for c in table.columns]:
-            raise Exception(f"Колонка '{address_column}' не найдена в таблице. Доступные колонки: {[c.name for c in table.columns]}")
+        if address_column not in column_names:
+            raise Exception(f"Колонка '{address_column}' не найдена в таблице. Доступные колонки: {column_names}")
+        
+        if id_column is not None and id_column not in column_names:
+            raise Exception(f"Колонка '{id_column}' не найдена в таблице. Доступные колонки: {column_names}")
         
-        if id_column is not None and id_column not in [c.name for c in table.columns]:
-            raise Exception(f"Колонка '{id_column}' не найдена в таблице. Доступные колонки: {[c.name for c in table.columns]}")
+        table = Table(actual_table_name, metadata, *(Column(name) for name in column_names))
         
         print(f"\nПараметры обработки:")
         print(f"  - Таблица: {actual_table_name}")
@@ -301,9 +321,10 @@ def process_db(dbms: str, user: str, password: str, host: str, port: str, db_nam
                 else:
                     query = select(table.c[address_column])
                 
-                # Выполняем запрос
+                # Выполняем запрос. Строки читаются с сервера порциями (серверный курсор),
+                # а не загружаются в память целиком
                 with engine.connect() as conn:
-                    result = conn.execute(query)
+                    result = conn.execute(query.execution_options(yield_per=ImprovedDatabaseOutputWorker.CHUNK_SIZE))
                     
                     for row in result:
                         total_processed += 1
@@ -352,7 +373,7 @@ def process_db(dbms: str, user: str, password: str, host: str, port: str, db_nam
                                     
                                 print(f"Данные для AddressDTO: {data}")
                                 dto = AddressDTO(**data)
-                                print(f"Созданный объект DTO: {dto.__dict__}")
+                                print(f"Созданный объект DTO: {dto}")
                             else:
                                 # Если колонки ID нет
                                 address = row[0]
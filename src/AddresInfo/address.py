@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from .street import Street
 from .type import StreetType
 from ..Rules import Parser
@@ -24,6 +26,8 @@ class Address:
     @classmethod
     def fromStr(cls, address: str) -> "Address":
         """Создание нового объекта адреса из сырой строки. Используется парсер по умолчанию.
+        Результат разбора строки кэшируется, повторяющиеся адреса заново не разбираются;
+        каждый вызов возвращает новый объект.
         
         Args:
             address (str): Сырой адрес.
@@ -36,11 +40,32 @@ class Address:
         """
 
         assert type(address) == str and len(address.strip()) != 0, "Адрес должен быть не пустой строкой."
-        match = Address.__parser.match(address)
+        parts = Address.__parse(address)
         
-        if not match:
+        if parts is None:
             raise ValueError("Не удалось разобрать входную строку на адрес.")
 
+        name, type_, house, flat = parts
+        return Address(Street(name, type_), house, flat)
+
+
+    @staticmethod
+    @lru_cache(maxsize=131072)
+    def __parse(address: str) -> tuple | None:
+        """Разбирает строку адреса парсером по умолчанию. Результат кэшируется.
+        Кэшируются только неизменяемые составные части, а не объект адреса, который вызывающий код может изменить.
+
+        Args:
+            address (str): Сырой адрес.
+
+        Returns:
+            tuple | None: Название улицы, тип улицы, дом и квартира или None, если адрес не распознан.
+        """
+
+        match = Address.__parser.match(address)
+        if not match:
+            return None
+
         addr = match.fact.__dict__
         street_ = addr["Street"]
         type_ = (
@@ -48,7 +73,7 @@ class Address:
             if street_ and street_.Type is not None
             else None
         )
-        street = Street(street_.Name, type_)
+        name = street_.Name
         
         flat = int(addr["Flat"]) if addr.get("Flat", None) else None
         house = addr["House"]
@@ -60,7 +85,7 @@ class Address:
             stroenie = "СТР. " + str(addr["Stroenie"])
             house = " ".join([house, stroenie])
 
-        return Address(street, house, flat)
+        return name, type_, house, flat
 
 
     def copy(self) -> "Address":
@@ -2,6 +2,7 @@ __all__ = ['StreetType']
 
 from typing import Generator
 import enum
+import sys
 import yargy
 
 from ..Rules import Tokenizer
@@ -174,4 +175,11 @@ class StreetType(enum.Enum):
             str: Короткое написание типа улицы.
         """
 
-        return self.value.short_name
\ No newline at end of file
+        return self._short_name
+
+
+# Короткое написание сохраняется в самом элементе перечисления: __str__ вызывается для каждой выводимой записи,
+# а обращение к Enum.value заметно медленнее обычного атрибута
+for _member in StreetType:
+    _member._short_name = sys.intern(_member._value_.short_name)
+del _member
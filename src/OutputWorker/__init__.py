@@ -9,9 +9,11 @@ from .improved_worker import ImprovedDatabaseOutputWorker
 __all__ = [
     "OutputWorker",
     "SingleTableExcelOutputWorker",
+    "RawXMLExcelOutputWorker",
     "AddressDTO",
     "LoggersCollection",
     "GUILogger",
+    "BufferedLogger",
     "DatabaseOutputWorker",
     "ImprovedDatabaseOutputWorker"
 ]
\ No newline at end of file
@@ -4,19 +4,83 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Iterable, NamedTuple
+import itertools
+import logging
 import sys
-from tkinter import Listbox, messagebox
 import time
 import traceback
 import re
 
+import numpy as np
 import pandas as pd
 from sqlalchemy import Engine, Integer, create_engine, MetaData, Table, Column, String, text, select
+from sqlalchemy import bindparam, column, func, table, update
 from sqlalchemy import inspect
 
 from ..AddresInfo import Address
-from .outputWorker import OutputWorker, AddressDTO, LoggersCollection
+from .outputWorker import OutputWorker, AddressDTO, LoggersCollection, _chunked, _copy_rows, _ensure_index
+
+_log = logging.getLogger(__name__)
+
+
+def _to_int(value: Any) -> int:
+    """Приводит значение ключа к int. Для значений, уже имеющих тип int, преобразование не выполняется.
+
+    Args:
+        value (Any): Значение ключа (int, float, str, numpy-число и т.п.).
+
+    Returns:
+        int: Значение ключа в виде int.
+    """
+
+    return value if type(value) is int else int(value)
+
+
+class ParsedAddress(NamedTuple):
+    """Нормализованный адрес, разбитый на слова (для сравнения адресов в _find_best_match)."""
+
+    canonical: str
+    words: tuple[str, ...]
+    word_set: frozenset[str]
+
+
+class ReferenceIndex(NamedTuple):
+    """Индекс справочника адресов для _find_best_match."""
+
+    canonical: list[str]                    # Нормализованные адреса справочника
+    exact: dict[tuple[str, ...], str]       # Слова адреса -> первый адрес справочника с такими словами
+    vocab: dict[str, int]                   # Слово -> номер слова
+    word_refs: list[np.ndarray]             # Номер слова -> номера адресов с этим словом (по возрастанию)
+    tokens: np.ndarray                      # Номера слов адресов по позициям (адреса x позиции)
+    unique_tokens: np.ndarray               # Номера различных слов адресов (адреса x слова)
+    last_tokens: np.ndarray                 # Номер последнего слова каждого адреса
+    lengths: np.ndarray                     # Количество слов в каждом адресе
+
+
+# Допустимые имена колонки с адресами во входной таблице (в нижнем регистре)
+_ADDR_ALIASES = frozenset({'address', 'raw_address', 'addr', 'adres'})
+
+# Нормализованный адрес в условии поиска записей по адресу (PostgreSQL). По этому же выражению
+# строится индекс входной таблицы, поэтому условие и индекс должны совпадать в точности
+_ADDR_NORM_SQL = 'UPPER(BTRIM({column}))'
+
+
+def _compile_alternation(keys: Iterable[str]) -> re.Pattern:
+    """Собирает из набора строк одно регулярное выражение-альтернацию. Более длинные строки
+    располагаются раньше коротких, чтобы, например, "УЛИЦА" имела приоритет над "УЛ ".
+
+    Args:
+        keys (Iterable[str]): Искомые строки.
+
+    Returns:
+        re.Pattern: Скомпилированное регулярное выражение.
+    """
+
+    return re.compile('|'.join(re.escape(key) for key in sorted(keys, key=len, reverse=True)))
+
 
 class ImprovedDatabaseOutputWorker(OutputWorker):
     """Улучшенная версия класса для записи в базу данных."""
@@ -38,7 +102,49 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
         'ЮЖНАЯ': 'ПОДСТАНЦИИ ЮЖНАЯ'
     }
 
-    def __init__(self, engine, input_table_name, output_table_name, schema, id_column=None, logger=None):
+    # Поиск первого по порядку словаря правила SPECIAL_RULES, входящего в слово (ключ - в последней группе)
+    _SPECIAL_RULES_RE = re.compile('|'.join(f'.*?({re.escape(key)})' for key in SPECIAL_RULES))
+
+    # Стандартные сокращения типов улиц для нормализации адреса
+    ABBREVIATIONS = {
+        'УЛИЦА': 'УЛ.',
+        'УЛ ': 'УЛ.',
+        'УЛ.': 'УЛ.',
+        'ПРОСПЕКТ': 'ПР-КТ',
+        'ПРОСП': 'ПР-КТ',
+        'ПР-Т': 'ПР-КТ',
+        'ПРОЕЗД': 'ПР-Д',
+        'ПР.': 'ПР-Д',
+        'БУЛЬВАР': 'Б-Р',
+        'БУЛ': 'Б-Р',
+        'ПЛОЩАДЬ': 'ПЛ.',
+        'ПЛ ': 'ПЛ.',
+    }
+    _ABBREVIATIONS_RE = _compile_alternation(ABBREVIATIONS)
+
+    # При расширении адреса дополнительно сокращаются территории и подстанции
+    EXPAND_ABBREVIATIONS = {
+        **ABBREVIATIONS,
+        'ТЕРРИТОРИЯ': 'ТЕР.',
+        'ТЕРРИТ': 'ТЕР.',
+        'ТЕР ': 'ТЕР.',
+        'ТЕР.': 'ТЕР.',
+        'ПОДСТАНЦИЯ': 'ПОДСТ.',
+        'ПОДСТ': 'ПОДСТ.',
+        'ПОДСТ.': 'ПОДСТ.',
+    }
+    _EXPAND_ABBREVIATIONS_RE = _compile_alternation(EXPAND_ABBREVIATIONS)
+
+    # Колонки выходной таблицы (кроме автоинкрементного id) в порядке записи
+    OUTPUT_COLUMNS = ('raw_address', 'street_name', 'street_type', 'house', 'flat', 'key', 'note')
+
+    # Количество адресов, записываемых в БД за один раз
+    CHUNK_SIZE = 10_000
+
+    # Сколько ошибок разбора записей одной порции выводится подробно
+    MAX_LOGGED_ERRORS = 5
+
+    def __init__(self, engine, input_table_name, output_table_name, schema, id_column=None, logger=None, per_row_fallback=False):
         """Инициализация объекта.
         
         Args:
@@ -48,6 +154,8 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
             schema: Схема БД.
             id_column: Имя колонки с ID (может быть None).
             logger: Объект для логирования.
+            per_row_fallback: Обновлять ключи отдельным запросом на каждую запись.
+                Нужно только для СУБД, которые не принимают длинные запросы с VALUES.
         """
         super().__init__(logger)
         self.engine = engine
@@ -55,6 +163,8 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
         self.output_table_name = output_table_name
         self.schema = schema
         self.id_column = id_column
+        self.per_row_fallback = per_row_fallback
+        self._reference_index = None  # Индекс справочника для _find_best_match (строится по требованию)
         print(f"Инициализация ImprovedDatabaseOutputWorker:")
         print(f"  - ID колонка: {self.id_column}")
         print(f"  - Входная таблица: {self.input_table_name}")
@@ -67,13 +177,20 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
         Args:
             addresses: Итератор объектов AddressDTO.
         """
+        try:
+            self._save(addresses)
+        finally:
+            # Сообщения, накопленные логгерами за время сохранения, выводятся одним пакетом
+            self.logger.flush()
+
+    def _save(self, addresses):
+        """Выполняет сохранение; вызывается из save(). """
         
-        # Проверка существования схемы
-        inspector = inspect(self.engine)
-        schemas = inspector.get_schema_names()
-        print(f"Доступные схемы в БД: {schemas}")
+        # Проверка существования схемы и таблиц (одним запросом к каталогу БД)
+        self._load_catalog()
         
-        if self.schema not in schemas:
+        if not self._schema_ok:
+            schemas = inspect(self.engine).get_schema_names()
             error_msg = f"Схема '{self.schema}' не найдена в базе данных. Доступные схемы: {schemas}"
             print(f"ОШИБКА: {error_msg}")
             raise Exception(error_msg)
@@ -86,11 +203,13 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
             print(f"ID колонка: {self.id_column if self.id_column else 'Не указана'}")
             
             # Проверяем существование выходной таблицы
-            tables = inspector.get_table_names(schema=self.schema)
-            table_exists = self.output_table_name.lower() in [t.lower() for t in tables]
+            table_exists = self._output_table_exists
+            append_mode = False
             
             # Запрашиваем у пользователя режим работы с таблицей
             if table_exists:
+                # Tkinter загружается только когда действительно нужен диалог
+                from tkinter import messagebox
                 response = messagebox.askyesnocancel(
                     "Таблица уже существует",
                     f"Таблица {self.output_table_name} уже существует.\n\nВыберите действие:",
@@ -106,291 +225,532 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
                 # Сохраняем выбор пользователя
                 append_mode = response  # True для дополнения, False для перезаписи
             
-            # ЭТАП 1: Сбор данных для сохранения
-            # ----------------------------------------
-            output_data = []  # Данные для выходной таблицы
-            update_data = []  # Данные для обновления ключей
+            # Колонки входной таблицы готовятся до чтения адресов: источник адресов может читать
+            # ту же таблицу через открытую транзакцию, и ALTER TABLE во время чтения ждал бы ее завершения
+            # False - во входной таблице не найдены нужные колонки, ключи не обновляются
+            key_update = self._prepare_key_update() or False
+            # Подсчет требует полного прохода по входной таблице, поэтому только для отладки
+            if key_update and _log.isEnabledFor(logging.DEBUG):
+                _log.debug("Текущее количество записей с ключами: %s", self._count_keys(*key_update[:2]))
             
-            for item in addresses:
-                try:
-                    # Проверяем, что item.raw является строкой, а не числом
-                    raw_address = str(item.raw) if item.raw is not None else None
-                    
-                    if raw_address is None:
-                        print("Пропуск записи с пустым адресом")
-                        continue
-                    
-                    # Нормализуем адрес для поиска
-                    normalized_address = self._normalize_address(raw_address)
-                    print(f"Обработка адреса: {raw_address}")
-                    print(f"Нормализованный адрес: {normalized_address}")
-                    
-                    # Данные для выходной таблицы
-                    output_data.append({
-                        'raw_address': raw_address,
-                        'street_name': item.Name if hasattr(item, 'Name') else None,
-                        'street_type': item.Type if hasattr(item, 'Type') else None,
-                        'house': item.House if hasattr(item, 'House') else None,
-                        'flat': item.Flat if hasattr(item, 'Flat') else None,
-                        'key': item.key,
-                        'note': item.note if hasattr(item, 'note') else ("Адрес не существует" if item.address is None or item.key is None else None)
-                    })
+            # Адреса обрабатываются порциями по CHUNK_SIZE записей: пока порция записывается в БД,
+            # следующая порция уже разбирается, а в памяти хранится не больше двух порций
+            prepared_count = 0
+            update_count = 0
+            success_count = 0
+            chunks = _chunked(addresses, self.CHUNK_SIZE)
+            first_chunk = next(chunks, [])  # Пустая первая порция: выходная таблица создается и без адресов
+            
+            # Порция записывается в фоновом потоке, пока основной поток разбирает следующую.
+            # Ключи порции обновляются только после записи ее строк в выходную таблицу: иначе при ошибке
+            # записи во входной таблице остались бы ключи адресов, которых нет в выходной.
+            # Все порции записываются в одной транзакции: при ошибке остаются прежние выходная таблица и ключи
+            # (поток записи завершается до фиксации транзакции)
+            with self.engine.begin() as conn, ThreadPoolExecutor(max_workers=1) as executor:
+                if self.engine.dialect.name == 'postgresql':
+                    # Результаты можно пересчитать повторным запуском, поэтому фиксация не ждет записи WAL на диск
+                    conn.exec_driver_sql('SET LOCAL synchronous_commit = off')
+                write_future = None
+                for chunk in itertools.chain([first_chunk], chunks):
+                    # ЭТАП 1: Сбор данных порции
+                    output_columns, update_idents, update_keys = self._collect_chunk(chunk)
+                    prepared_count += len(output_columns['raw_address'])
+                    update_count += len(update_keys)
                     
-                    # Проверяем, был ли адрес успешно распознан для обновления ключей
-                    if item.key is None:
-                        print(f"Адрес не распознан: {raw_address}")
-                        continue
+                    # Перед записью следующей порции дожидаемся записи предыдущей
+                    if write_future is not None:
+                        success_count += write_future.result()
                     
-                    # Данные для обновления ключей
-                    if item.key is not None:
-                        if self.id_column:
-                            # Если указана ID-колонка, ищем ID в объекте
-                            id_value = getattr(item, 'ID', None)  # Используем 'ID' вместо self.id_column
-                            
-                            if id_value is not None:
-                                try:
-                                    # Преобразуем ID в число, если это возможно
-                                    if isinstance(id_value, str):
-                                        try:
-                                            id_value = int(id_value)
-                                        except ValueError:
-                                            # Если не удалось преобразовать в число, оставляем как строку
-                                            pass
-                                    
-                                    update_data.append({
-                                        'id': id_value,
-                                        'key': int(item.key) if isinstance(item.key, (int, float, str)) else item.key
-                                    })
-                                    print(f"Добавлены данные для обновления с ID: {id_value}, key: {item.key}")
-                                except (ValueError, TypeError) as e:
-                                    print(f"Ошибка при обработке ID={id_value}, key={item.key}: {e}")
-                            else:
-                                print(f"ID не найден для записи с ключом {item.key}")
-                        else:
-                            # Если ID-колонка не указана, используем адрес как идентификатор
-                            try:
-                                update_data.append({
-                                    'address': raw_address,
-                                    'key': int(item.key) if isinstance(item.key, (int, float, str)) else item.key
-                                })
-                                print(f"Добавлены данные для обновления по адресу: '{raw_address}', key: {item.key}")
-                            except (ValueError, TypeError) as e:
-                                print(f"Ошибка при обработке address='{raw_address}', key={item.key}: {e}")
-                except Exception as e:
-                    print(f"Ошибка при обработке записи: {str(e)}")
-                    print(f"Детали записи: {item.__dict__}")
-                    continue
+                    # ЭТАПЫ 2 и 3: Заполнение выходной таблицы (после первой порции таблица только дополняется)
+                    # и обновление ключей во входной таблице
+                    write_future = executor.submit(self._write_chunk, conn, output_columns, table_exists, append_mode,
+                                                   key_update, update_idents, update_keys)
+                    table_exists, append_mode = True, True
+                
+                if write_future is not None:
+                    success_count += write_future.result()
             
-            print(f"Подготовлено {len(output_data)} записей для выходной таблицы")
-            print(f"Подготовлено {len(update_data)} записей для обновления ключей")
+            print(f"Подготовлено {prepared_count} записей для выходной таблицы")
+            print(f"Подготовлено {update_count} записей для обновления ключей")
             
-            # ЭТАП 2: Создание и заполнение выходной таблицы
-            # ----------------------------------------
-            try:
-                # Создаем метаданные
-                metadata = MetaData(schema=self.schema)
-                
-                # Определяем структуру выходной таблицы
-                output_table = Table(
-                    self.output_table_name,
-                    metadata,
-                    Column('id', Integer, primary_key=True),
-                    Column('raw_address', String),
-                    Column('street_name', String),
-                    Column('street_type', String),
-                    Column('house', String),
-                    Column('flat', String),
-                    Column('key', Integer),
-                    Column('note', String),
-                    extend_existing=True
-                )
-                
-                if table_exists:
-                    if append_mode:  # Дополнение существующей таблицы
-                        with self.engine.begin() as conn:
-                            conn.execute(output_table.insert(), output_data)
-                        print(f"Добавлено {len(output_data)} записей в существующую таблицу")
-                    else:  # Перезапись таблицы
-                        output_table.drop(self.engine, checkfirst=True)
-                        output_table.create(self.engine)
-                        with self.engine.begin() as conn:
-                            conn.execute(output_table.insert(), output_data)
-                        print(f"Таблица перезаписана, добавлено {len(output_data)} записей")
-                else:
-                    # Создаем новую таблицу
-                    output_table.create(self.engine)
-                    with self.engine.begin() as conn:
-                        conn.execute(output_table.insert(), output_data)
-                    print(f"Создана новая таблица с {len(output_data)} записями")
-                
-            except Exception as e:
-                print(f"Ошибка при работе с выходной таблицей: {str(e)}")
-                print(f"Трассировка: {traceback.format_exc()}")
-                raise Exception(f"Ошибка при работе с выходной таблицей: {str(e)}")
-            
-            # ЭТАП 3: Обновление ключей во входной таблице
-            # ----------------------------------------
-            if not update_data:
+            if not key_update or not update_count:
                 print("Нет данных для обновления ключей")
-                return
+            else:
+                # Число обновленных записей берется из rowcount пакетных UPDATE, без повторного COUNT(*)
+                print("\n===== ФИНАЛЬНЫЕ РЕЗУЛЬТАТЫ =====")
+                print(f"Всего успешно обновлено: {success_count}")
+                print(f"Общее количество записей для обновления: {update_count}")
             
-            # Инспектор для изучения структуры БД
-            inspector = inspect(self.engine)
+            print("\n===== ЗАВЕРШЕНИЕ ПРОЦЕССА СОХРАНЕНИЯ =====")
             
+        except Exception as e:
+            error_msg = f"Ошибка при сохранении результатов: {str(e)}\n{traceback.format_exc()}"
+            print(error_msg)
+            self.logger.write(error_msg)
+            raise Exception(error_msg)
+
+    def _collect_chunk(self, chunk: list[AddressDTO]) -> tuple[dict[str, list], list, list[int]]:
+        """Собирает данные порции адресов для выходной таблицы и для обновления ключей.
+
+        Args:
+            chunk (list[AddressDTO]): Порция адресов.
+
+        Returns:
+            tuple[dict[str, list], list, list[int]]: Данные для выходной таблицы по колонкам OUTPUT_COLUMNS,
+                ID (или адреса) записей для обновления ключей и сами ключи.
+        """
+
+        # Данные собираются по колонкам (список на каждую колонку),
+        # а не словарем на каждую строку
+        output_columns = {name: [] for name in self.OUTPUT_COLUMNS}  # Данные для выходной таблицы
+        update_idents = []  # ID (или адреса) записей для обновления ключей
+        update_keys = []    # Ключи для обновления
+        
+        # Все, что не зависит от записи, вычисляется один раз на порцию
+        debug = _log.isEnabledFor(logging.DEBUG)
+        error_count = 0
+        by_address = not self.id_column
+        append_raw = output_columns['raw_address'].append
+        append_name = output_columns['street_name'].append
+        append_type = output_columns['street_type'].append
+        append_house = output_columns['house'].append
+        append_flat = output_columns['flat'].append
+        append_key = output_columns['key'].append
+        append_note = output_columns['note'].append
+        
+        for item in chunk:
             try:
-                # Проверка существования таблицы
-                tables = inspector.get_table_names(schema=self.schema)
-                print(f"Доступные таблицы: {tables}")
+                # Проверяем, что item.raw является строкой, а не числом
+                raw_address = str(item.raw) if item.raw is not None else None
                 
-                # Поиск таблицы с учетом регистра
-                actual_table_name = None
-                for table in tables:
-                    if table.lower() == self.input_table_name.lower():
-                        actual_table_name = table
-                        print(f"Найдена входная таблица: {actual_table_name}")
-                        break
+                if raw_address is None:
+                    if debug:
+                        _log.debug("Пропуск записи с пустым адресом")
+                    continue
                 
-                if not actual_table_name:
-                    print(f"ОШИБКА: Таблица {self.input_table_name} не найдена в схеме {self.schema}")
-                    return
+                # Нормализованный адрес нужен только для отладочного вывода
+                if debug:
+                    _log.debug("Обработка адреса: %s, нормализованный адрес: %s", raw_address, self._normalize_address(raw_address))
                 
-                # Исследуем колонки таблицы
-                columns = inspector.get_columns(actual_table_name, schema=self.schema)
-                print(f"Колонки входной таблицы:")
-                column_names = []
-                for col in columns:
-                    print(f"  - {col['name']} (тип: {col['type']})")
-                    column_names.append(col['name'])
+                # Ключ приводится к int до записи в колонки, чтобы при ошибке колонки не разошлись по длине
+                key = _to_int(item.key) if item.key is not None else None
                 
-                # Если используем адрес как идентификатор, ищем подходящую колонку
-                address_column_name = None
-                if not self.id_column:
-                    for col_name in column_names:
-                        if col_name.lower() in ['address', 'raw_address', 'addr', 'adres']:
-                            address_column_name = col_name
-                            print(f"Найдена колонка с адресами: {address_column_name}")
-                            break
-                    
-                    if not address_column_name:
-                        print("ОШИБКА: Не найдена колонка с адресами во входной таблице")
-                        return
-                # Иначе ищем ID-колонку
-                else:
-                    id_column_name = None
-                    for col_name in column_names:
-                        if col_name.lower() == self.id_column.lower():
-                            id_column_name = col_name
-                            print(f"Найдена ID-колонка: {id_column_name}")
-                            break
-                    
-                    if not id_column_name:
-                        print(f"ОШИБКА: Колонка {self.id_column} не найдена в таблице")
-                        return
-                    
-                    # Сохраняем имя колонки с учетом регистра
-                    self.id_column = id_column_name
-                
-                # Проверяем наличие колонки для ключей
-                key_column_name = None
-                for col_name in column_names:
-                    if col_name.lower() == 'key_street_house':
-                        key_column_name = col_name
-                        print(f"Найдена колонка для ключей: {key_column_name}")
-                        break
+                # Данные для выходной таблицы
+                append_raw(raw_address)
+                # Поля Name, Type, House, Flat и note AddressDTO заполняет всегда
+                append_name(item.Name)
+                append_type(item.Type)
+                append_house(item.House)
+                append_flat(item.Flat)
+                append_key(key)
+                append_note(item.note)
                 
-                # Если колонки нет, создаем ее
-                if not key_column_name:
-                    print("Колонка key_street_house не найдена, создаем...")
-                    with self.engine.begin() as conn:
-                        conn.execute(text(f'ALTER TABLE "{self.schema}"."{actual_table_name}" ADD COLUMN "key_street_house" INTEGER'))
-                    print("Колонка key_street_house создана")
-                    key_column_name = "key_street_house"
-                
-                # ЭТАП 4: Обновление ключей
-                # ----------------------------------------
-                print("\n===== ОБНОВЛЕНИЕ КЛЮЧЕЙ =====")
+                # Проверяем, был ли адрес успешно распознан для обновления ключей
+                if key is None:
+                    if debug:
+                        _log.debug("Адрес не распознан: %s", raw_address)
+                    continue
                 
-                # Определяем режим обновления
-                using_address = not self.id_column
+                # Данные для обновления ключей
+                if by_address:
+                    # Если ID-колонка не указана, используем адрес как идентификатор
+                    update_keys.append(key)
+                    update_idents.append(raw_address)
+                    if debug:
+                        _log.debug("Добавлены данные для обновления по адресу: '%s', key: %s", raw_address, item.key)
+                    continue
                 
-                # Создаем подключение и курсор
-                conn = self.engine.raw_connection()
-                cursor = conn.cursor()
+                # Если указана ID-колонка, ищем ID в объекте
+                id_value = getattr(item, 'ID', None)  # Используем 'ID' вместо self.id_column
+                if id_value is None:
+                    if debug:
+                        _log.debug("ID не найден для записи с ключом %s", item.key)
+                    continue
                 
-                # Проверяем количество записей с непустыми ключами до обновления
-                sql_check = f'SELECT COUNT(*) FROM "{self.schema}"."{actual_table_name}" WHERE "{key_column_name}" IS NOT NULL'
-                cursor.execute(sql_check)
-                initial_keys_count = cursor.fetchone()[0]
-                print(f"Текущее количество записей с ключами: {initial_keys_count}")
+                # Преобразуем ID в число, если это возможно
+                if type(id_value) is str:
+                    try:
+                        id_value = int(id_value)
+                    except ValueError:
+                        # Если не удалось преобразовать в число, оставляем как строку
+                        pass
                 
-                # МЕТОД 1: Простое обновление по одной записи
-                print("\nМЕТОД 1: Простое обновление по одной записи...")
-                success_count = 0
-                error_count = 0
+                update_keys.append(key)
+                update_idents.append(id_value)
+                if debug:
+                    _log.debug("Добавлены данные для обновления с ID: %s, key: %s", id_value, item.key)
+            except Exception:
+                # Подробно (с трассировкой) описываются только первые ошибки порции
+                error_count += 1
+                if error_count <= self.MAX_LOGGED_ERRORS:
+                    _log.exception("Ошибка при обработке записи: %s", item)
+                continue
+
+        if error_count:
+            self.logger.write(f"Не удалось обработать записей в порции: {error_count}\n")
+
+        return output_columns, update_idents, update_keys
+
+    def _write_chunk(self, conn, output_columns: dict[str, list], table_exists: bool, append_mode: bool,
+                     key_update: tuple[str, str, str, bool] | bool, update_idents: list, update_keys: list[int]) -> int:
+        """Записывает порцию в выходную таблицу, после чего обновляет ключи ее записей во входной таблице.
+
+        Args:
+            conn: Соединение SQLAlchemy, внутри транзакции которого выполняется запись.
+            output_columns (dict[str, list]): Данные для выходной таблицы по колонкам OUTPUT_COLUMNS.
+            table_exists (bool): Существует ли выходная таблица.
+            append_mode (bool): Дополнять ли существующую таблицу (иначе она перезаписывается).
+            key_update (tuple[str, str, str, bool] | bool): Результат _prepare_key_update (False - ключи не обновляются).
+            update_idents (list): ID (или адреса) записей для обновления ключей.
+            update_keys (list[int]): Ключи записей.
+
+        Returns:
+            int: Количество обновленных записей.
+        """
+
+        self._write_output(conn, output_columns, table_exists, append_mode)
+        if not (update_keys and key_update):
+            return 0
+        return self._batch_update(conn, *key_update[:3], update_idents, update_keys, key_update[3])
+
+    def _write_output(self, conn, output_columns: dict[str, list], table_exists: bool, append_mode: bool):
+        """Создает (или дополняет/перезаписывает) выходную таблицу и записывает в нее результаты.
+
+        Args:
+            conn: Соединение SQLAlchemy, внутри транзакции которого выполняется запись.
+            output_columns (dict[str, list]): Данные для выходной таблицы по колонкам OUTPUT_COLUMNS.
+            table_exists (bool): Существует ли выходная таблица.
+            append_mode (bool): Дополнять ли существующую таблицу (иначе она перезаписывается).
+        """
+
+        try:
+            # Строки для вставки собираются из колонок только в момент записи
+            rows = list(zip(*output_columns.values()))
+            
+            # Создаем метаданные
+            metadata = MetaData(schema=self.schema)
+            
+            # Определяем структуру выходной таблицы
+            output_table = Table(
+                self.output_table_name,
+                metadata,
+                Column('id', Integer, primary_key=True),
+                Column('raw_address', String),
+                Column('street_name', String),
+                Column('street_type', String),
+                Column('house', String),
+                Column('flat', String),
+                Column('key', Integer),
+                Column('note', String),
+                extend_existing=True
+            )
+            
+            if table_exists:
+                if append_mode:  # Дополнение существующей таблицы
+                    self._insert_output(conn, output_table, rows)
+                    print(f"Добавлено {len(rows)} записей в существующую таблицу")
+                elif self.engine.dialect.name == 'postgresql' and self._output_columns == ['id', *self.OUTPUT_COLUMNS]:
+                    # Структура таблицы совпадает - очищаем ее вместо пересоздания
+                    conn.exec_driver_sql(f'TRUNCATE TABLE "{self.schema}"."{self.output_table_name}" RESTART IDENTITY')
+                    self._insert_output(conn, output_table, rows)
+                    print(f"Таблица очищена, добавлено {len(rows)} записей")
+                else:  # Перезапись таблицы (структура отличается, поэтому таблица пересоздается)
+                    # Удаление, создание и загрузка выполняются в одной транзакции: в СУБД с транзакционным
+                    # DDL (PostgreSQL) при ошибке загрузки остается прежняя таблица
+                    output_table.drop(conn, checkfirst=True)
+                    output_table.create(conn)
+                    self._insert_output(conn, output_table, rows)
+                    print(f"Таблица перезаписана, добавлено {len(rows)} записей")
+            else:
+                # Создаем новую таблицу и сразу загружаем в нее данные
+                output_table.create(conn)
+                self._insert_output(conn, output_table, rows)
+                print(f"Создана новая таблица с {len(rows)} записями")
+            
+        except Exception as e:
+            print(f"Ошибка при работе с выходной таблицей: {str(e)}")
+            print(f"Трассировка: {traceback.format_exc()}")
+            raise Exception(f"Ошибка при работе с выходной таблицей: {str(e)}")
+
+    def _insert_output(self, conn, output_table: Table, rows: list[tuple]):
+        """Вставляет строки в выходную таблицу. Для PostgreSQL данные загружаются через COPY,
+        для остальных СУБД используется стандартный executemany SQLAlchemy
+        (для MSSQL движок создается с fast_executemany).
+
+        Args:
+            conn: Соединение SQLAlchemy, внутри транзакции которого выполняется вставка.
+            output_table (Table): Выходная таблица.
+            rows (list[tuple]): Строки со значениями колонок OUTPUT_COLUMNS.
+        """
+
+        if self.engine.dialect.name == 'postgresql':
+            columns = ', '.join(f'"{name}"' for name in self.OUTPUT_COLUMNS)
+            sql = f'COPY "{self.schema}"."{self.output_table_name}" ({columns}) FROM STDIN'
+            _copy_rows(conn, sql, rows)
+        else:
+            conn.execute(output_table.insert(), [dict(zip(self.OUTPUT_COLUMNS, row)) for row in rows])
+
+    def _prepare_key_update(self) -> tuple[str, str, str, bool] | None:
+        """Находит во входной таблице колонку для поиска записей и колонку для ключей,
+        при необходимости создавая колонку key_street_house.
+
+        Returns:
+            tuple[str, str, str, bool] | None: Имя входной таблицы, имя колонки для ключей, имя колонки
+                для поиска записей и признак поиска по адресу; None, если таблица или колонка не найдены.
+        """
+
+        try:
+            # Проверка существования таблицы (поиск выполнен с учетом регистра при загрузке каталога)
+            actual_table_name = self._actual_table_name
+            
+            if not actual_table_name:
+                print(f"ОШИБКА: Таблица {self.input_table_name} не найдена в схеме {self.schema}")
+                return
+            print(f"Найдена входная таблица: {actual_table_name}")
+            
+            # Исследуем колонки таблицы
+            print(f"Колонки входной таблицы:")
+            column_names = []
+            for col_name, col_type in self._columns:
+                print(f"  - {col_name} (тип: {col_type})")
+                column_names.append(col_name)
+            
+            # Имена колонок в нижнем регистре для поиска без учета регистра
+            columns_by_lower = {}
+            for col_name in column_names:
+                columns_by_lower.setdefault(col_name.lower(), col_name)
+            
+            # Если используем адрес как идентификатор, ищем подходящую колонку
+            address_column_name = None
+            if not self.id_column:
+                for col_name in column_names:
+                    if col_name.lower() in _ADDR_ALIASES:
+                        address_column_name = col_name
+                        print(f"Найдена колонка с адресами: {address_column_name}")
+                        break
                 
-                for update in update_data:
-                    try:
-                        if using_address:
-                            # Используем адрес как идентификатор
-                            addr_val = update['address']
-                            key_val = update['key']
-                            # Очищаем лишние пробелы и экранируем кавычки в адресе для безопасности SQL-запроса
-                            safe_addr = addr_val.strip().replace("'", "''")
-                            # Используем CASE-INSENSITIVE сравнение для большей надежности
-                            sql = f'UPDATE "{self.schema}"."{actual_table_name}" SET "{key_column_name}" = {key_val} WHERE TRIM(BOTH FROM UPPER("{address_column_name}")) = UPPER(\'{safe_addr}\')'
-                            if success_count < 5:  # Показываем только первые несколько запросов
-                                print(f"SQL запрос: {sql}")
-                        else:
-                            # Используем id как идентификатор
-                            id_val = update['id']
-                            key_val = update['key']
-                            sql = f'UPDATE "{self.schema}"."{actual_table_name}" SET "{key_column_name}" = {key_val} WHERE "{self.id_column}" = {id_val}'
-                            if success_count < 5:  # Показываем только первые несколько запросов
-                                print(f"SQL запрос: {sql}")
-                        
-                        # Выполняем запрос
-                        cursor.execute(sql)
-                        conn.commit()
-                        if cursor.rowcount > 0:
-                            success_count += 1
-                            print(f"Успешно обновлена запись {success_count}: key={key_val}")
-                        
-                    except Exception as e:
-                        error_count += 1
-                        if error_count <= 5:  # Ограничиваем вывод ошибок
-                            print(f"Ошибка при обновлении записи: {str(e)}")
-                            print(f"Детали обновления: {update}")
+                if not address_column_name:
+                    print("ОШИБКА: Не найдена колонка с адресами во входной таблице")
+                    return
                 
-                print(f"Всего успешно обновлено: {success_count}, ошибок: {error_count}")
+                # Записи ищутся по нормализованному адресу: без индекса по этому выражению
+                # каждое обновление просматривает всю таблицу
+                if self.engine.dialect.name == 'postgresql':
+                    _ensure_index(self.engine, self.schema, actual_table_name, address_column_name,
+                                  _ADDR_NORM_SQL.format(column=f'"{address_column_name}"'))
+            # Иначе ищем ID-колонку
+            else:
+                id_column_name = columns_by_lower.get(self.id_column.lower())
+                if id_column_name:
+                    print(f"Найдена ID-колонка: {id_column_name}")
+                else:
+                    print(f"ОШИБКА: Колонка {self.id_column} не найдена в таблице")
+                    return
                 
-                # Финальная проверка
-                print("\n===== ФИНАЛЬНЫЕ РЕЗУЛЬТАТЫ =====")
-                cursor.execute(sql_check)
-                final_keys_count = cursor.fetchone()[0]
-                print(f"Всего записей с ключами до обновления: {initial_keys_count}")
-                print(f"Всего записей с ключами после обновления: {final_keys_count}")
-                print(f"Добавлено новых ключей: {final_keys_count - initial_keys_count}")
-                print(f"Общее количество записей для обновления: {len(update_data)}")
+                # Сохраняем имя колонки с учетом регистра
+                self.id_column = id_column_name
                 
-                # Закрываем соединения
-                cursor.close()
-                conn.close()
+                # Записи ищутся по ID: без индекса каждое обновление просматривает всю таблицу
+                if self.engine.dialect.name == 'postgresql':
+                    _ensure_index(self.engine, self.schema, actual_table_name, id_column_name)
             
-            except Exception as e:
-                print(f"Ошибка при анализе структуры БД: {str(e)}")
-                print(f"Трассировка: {traceback.format_exc()}")
-                raise Exception(f"Ошибка при анализе структуры БД: {str(e)}")
+            # Проверяем наличие колонки для ключей
+            key_column_name = columns_by_lower.get('key_street_house')
+            if key_column_name:
+                print(f"Найдена колонка для ключей: {key_column_name}")
             
-            print("\n===== ЗАВЕРШЕНИЕ ПРОЦЕССА СОХРАНЕНИЯ =====")
+            # Если колонки нет, создаем ее
+            if not key_column_name:
+                print("Колонка key_street_house не найдена, создаем...")
+                with self.engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE "{self.schema}"."{actual_table_name}" ADD COLUMN "key_street_house" INTEGER'))
+                print("Колонка key_street_house создана")
+                key_column_name = "key_street_house"
+                self._columns.append((key_column_name, "INTEGER"))
             
+            # Определяем режим обновления
+            using_address = not self.id_column
+            match_column_name = address_column_name if using_address else self.id_column
+            return actual_table_name, key_column_name, match_column_name, using_address
+        
         except Exception as e:
-            error_msg = f"Ошибка при сохранении результатов: {str(e)}\n{traceback.format_exc()}"
-            print(error_msg)
-            self.logger.write(error_msg)
-            raise Exception(error_msg)
-            
-    def _expand_address_with_rules(self, address: str) -> str:
-        """Преобразует адрес в полную форму с помощью правил.
+            print(f"Ошибка при анализе структуры БД: {str(e)}")
+            print(f"Трассировка: {traceback.format_exc()}")
+            raise Exception(f"Ошибка при анализе структуры БД: {str(e)}")
+
+    def _count_keys(self, table_name: str, key_column_name: str) -> int:
+        """Считает записи входной таблицы с непустыми ключами.
+
+        Args:
+            table_name (str): Имя входной таблицы.
+            key_column_name (str): Имя колонки для ключей.
+
+        Returns:
+            int: Количество записей с ключами.
+        """
+
+        sql_check = f'SELECT COUNT(*) FROM "{self.schema}"."{table_name}" WHERE "{key_column_name}" IS NOT NULL'
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql(sql_check).scalar()
+
+    def _load_catalog(self):
+        """Загружает из каталога БД сведения о схеме, входной и выходной таблицах и их колонках.
+        Для PostgreSQL это один запрос к pg_catalog, для остальных СУБД используется инспектор SQLAlchemy.
+
+        Результат сохраняется в атрибутах:
+            _schema_ok (bool): Существует ли схема.
+            _actual_table_name (str | None): Имя входной таблицы с учетом регистра.
+            _output_table_exists (bool): Существует ли выходная таблица.
+            _output_columns (list[str]): Имена колонок выходной таблицы (если ее имя совпадает с учетом регистра).
+            _columns (list[tuple[str, str]]): Колонки входной таблицы (имя, тип).
+        """
+
+        input_name = self.input_table_name.lower()
+        output_name = self.output_table_name.lower()
+        tables = {}  # {имя таблицы: [(колонка, тип)]}
+
+        if self.engine.dialect.name == 'postgresql':
+            sql = (
+                "SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod) "
+                "FROM pg_namespace n "
+                "LEFT JOIN pg_class c ON c.relnamespace = n.oid AND c.relkind IN ('r', 'p') "
+                "AND LOWER(c.relname) IN (%(input)s, %(output)s) "
+                "LEFT JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped "
+                "WHERE n.nspname = %(schema)s "
+                "ORDER BY c.relname, a.attnum"
+            )
+            with self.engine.connect() as conn:
+                rows = conn.exec_driver_sql(sql, {'schema': self.schema, 'input': input_name, 'output': output_name}).all()
+
+            # Если схема есть, запрос вернет хотя бы одну строку (с пустыми полями при отсутствии таблиц)
+            schema_ok = len(rows) > 0
+            for table_name, col_name, col_type in rows:
+                if table_name is None:
+                    continue
+                columns = tables.setdefault(table_name, [])
+                if col_name is not None:
+                    columns.append((col_name, col_type))
+        else:
+            inspector = inspect(self.engine)
+            schema_ok = self.schema in inspector.get_schema_names()
+            if schema_ok:
+                for table_name in inspector.get_table_names(schema=self.schema):
+                    if table_name.lower() in (input_name, output_name):
+                        tables[table_name] = [(col['name'], str(col['type'])) for col in inspector.get_columns(table_name, schema=self.schema)]
+
+        self._schema_ok = schema_ok
+        self._actual_table_name = next((t for t in tables if t.lower() == input_name), None)
+        self._output_table_exists = any(t.lower() == output_name for t in tables)
+        self._columns = tables.get(self._actual_table_name, [])
+        self._output_columns = [col_name for col_name, _ in tables.get(self.output_table_name, [])]
+
+    def _batch_update(self, conn, table_name: str, key_column_name: str, match_column_name: str, idents: list, keys: list[int], using_address: bool) -> int:
+        """Обновляет ключи во входной таблице. В PostgreSQL - одним запросом UPDATE ... FROM
+        по временной таблице, в остальных СУБД - параметризованным UPDATE через executemany.
+
+        Args:
+            conn: Соединение SQLAlchemy, внутри транзакции которого выполняется обновление.
+            table_name (str): Имя входной таблицы.
+            key_column_name (str): Имя колонки для ключей.
+            match_column_name (str): Имя колонки, по которой ищутся записи (ID или адрес).
+            idents (list): ID (или адреса) записей.
+            keys (list[int]): Ключи записей.
+            using_address (bool): Искать ли записи по адресу, а не по ID.
+
+        Returns:
+            int: Количество обновленных записей.
+        """
+
+        # Повторяющиеся записи схлопываются (последний ключ побеждает, как при построчном обновлении)
+        updates = {}
+        for ident, key_val in zip(idents, keys):
+            updates[ident.strip() if using_address else ident] = key_val
+        rows = list(updates.items())
+
+        if self.engine.dialect.name != 'postgresql':
+            return self._batch_update_executemany(conn, table_name, key_column_name, match_column_name, rows, using_address)
+
+        if using_address:
+            # Регистр приводится на стороне БД с обеих сторон, чтобы сравнение шло по правилам ее collation.
+            # Левая часть совпадает с выражением индекса, созданного в _prepare_key_update
+            normalized = _ADDR_NORM_SQL.format(column=f't."{match_column_name}"')
+            condition = f'{normalized} = UPPER(u.ident)'
+        else:
+            condition = f't."{match_column_name}" = u.ident'
+
+        if self.per_row_fallback:
+            print("\nПострочное обновление ключей...")
+            sql = f'UPDATE "{self.schema}"."{table_name}" AS t SET "{key_column_name}" = %s WHERE {condition.replace("u.ident", "%s")}'
+            print(f"SQL запрос: {sql}")
+            from psycopg2.extras import execute_batch
+
+            # Один параметризованный запрос, отправляемый страницами по 500 записей за обращение к БД.
+            # rowcount при пакетной отправке относится только к последнему запросу страницы,
+            # поэтому возвращается количество отправленных записей
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                execute_batch(cursor, sql, [(key_val, ident) for ident, key_val in rows], page_size=500)
+                return len(rows)
+            finally:
+                cursor.close()
+
+        print("\nПакетное обновление ключей...")
+        # Пары (идентификатор, ключ) загружаются через COPY во временную таблицу того же типа,
+        # что и колонка поиска, после чего выполняется один UPDATE с соединением
+        if using_address:
+            ident_type = 'text'
+        else:
+            ident_type = next((col_type for col_name, col_type in self._columns if col_name == match_column_name), 'bigint')
+        conn.exec_driver_sql(f'CREATE TEMP TABLE _key_updates (ident {ident_type}, key integer) ON COMMIT DROP')
+        _copy_rows(conn, 'COPY _key_updates (ident, key) FROM STDIN', rows)
+        conn.exec_driver_sql('ANALYZE _key_updates')
+
+        sql = (
+            f'UPDATE "{self.schema}"."{table_name}" AS t SET "{key_column_name}" = u.key '
+            f'FROM _key_updates AS u '
+            f'WHERE {condition}'
+        )
+        print(f"SQL запрос: {sql}")
+        updated = conn.exec_driver_sql(sql).rowcount
+        # В одной транзакции обновляются ключи нескольких порций, поэтому таблица удаляется сразу
+        conn.exec_driver_sql('DROP TABLE _key_updates')
+        return updated
+
+    def _batch_update_executemany(self, conn, table_name: str, key_column_name: str, match_column_name: str, rows: list[tuple], using_address: bool) -> int:
+        """Обновляет ключи во входной таблице одним параметризованным UPDATE, переданным через executemany.
+        Используется для СУБД, отличных от PostgreSQL (Oracle, MSSQL Server, SQLite).
+
+        Args:
+            conn: Соединение SQLAlchemy, внутри транзакции которого выполняется обновление.
+            table_name (str): Имя входной таблицы.
+            key_column_name (str): Имя колонки для ключей.
+            match_column_name (str): Имя колонки, по которой ищутся записи (ID или адрес).
+            rows (list[tuple]): Пары (ID или адрес записи, ключ).
+            using_address (bool): Искать ли записи по адресу, а не по ID.
+
+        Returns:
+            int: Количество обновленных записей.
+        """
+
+        print("\nПакетное обновление ключей...")
+        input_table = table(table_name, column(key_column_name), column(match_column_name), schema=self.schema)
+        match_column = input_table.c[match_column_name]
+        if using_address:
+            # Как и в PostgreSQL, регистр приводится на стороне БД с обеих сторон
+            condition = func.upper(func.trim(match_column)) == func.upper(bindparam('u_ident'))
+        else:
+            condition = match_column == bindparam('u_ident')
+        sql = update(input_table).where(condition).values({key_column_name: bindparam('u_key')})
+        print(f"SQL запрос: {sql.compile(dialect=self.engine.dialect)}")
+
+        affected = conn.execute(sql, [{'u_ident': ident, 'u_key': key_val} for ident, key_val in rows]).rowcount
+        # Не все драйверы сообщают rowcount для executemany (-1)
+        return affected if affected >= 0 else len(rows)
+
+    @classmethod
+    @lru_cache(maxsize=131072)
+    def _expand_address_with_rules(cls, address: str) -> str:
+        """Преобразует адрес в полную форму с помощью правил. Результат кэшируется.
         
         Args:
             address (str): Исходный адрес.
@@ -401,58 +761,31 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
         if not address:
             return ""
             
-        print(f"\n{'='*50}")
-        print(f"РАСШИРЕНИЕ АДРЕСА С ПОМОЩЬЮ ПРАВИЛ")
-        print(f"Исходный адрес: {address}")
-        print(f"{'='*50}")
+        _log.debug("Расширение адреса с помощью правил: %s", address)
         
         # Приводим к верхнему регистру
         address = address.upper()
-        print(f"\nПосле приведения к верхнему регистру:")
-        print(f"  - Адрес: {address}")
-        
-        # Заменяем различные варианты написания на стандартные
-        replacements = {
-            'УЛИЦА': 'УЛ.',
-            'УЛ ': 'УЛ.',
-            'УЛ.': 'УЛ.',
-            'ПРОСПЕКТ': 'ПР-КТ',
-            'ПРОСП': 'ПР-КТ',
-            'ПР-Т': 'ПР-КТ',
-            'ПРОЕЗД': 'ПР-Д',
-            'ПР.': 'ПР-Д',
-            'БУЛЬВАР': 'Б-Р',
-            'БУЛ': 'Б-Р',
-            'ПЛОЩАДЬ': 'ПЛ.',
-            'ПЛ ': 'ПЛ.',
-            'ТЕРРИТОРИЯ': 'ТЕР.',
-            'ТЕРРИТ': 'ТЕР.',
-            'ТЕР ': 'ТЕР.',
-            'ТЕР.': 'ТЕР.',
-            'ПОДСТАНЦИЯ': 'ПОДСТ.',
-            'ПОДСТ': 'ПОДСТ.',
-            'ПОДСТ.': 'ПОДСТ.',
-        }
-        
-        # Применяем замены
-        for old, new in replacements.items():
-            if old in address:
-                print(f"  - Замена '{old}' на '{new}'")
-                address = address.replace(old, new)
-        print(f"После замены сокращений:")
-        print(f"  - Адрес: {address}")
+        _log.debug("После приведения к верхнему регистру: %s", address)
+        
+        # Заменяем различные варианты написания на стандартные за один проход
+        def replace_abbreviation(match: re.Match) -> str:
+            new = cls.EXPAND_ABBREVIATIONS[match.group(0)]
+            _log.debug("Замена '%s' на '%s'", match.group(0), new)
+            return new
+
+        address = cls._EXPAND_ABBREVIATIONS_RE.sub(replace_abbreviation, address)
+        _log.debug("После замены сокращений: %s", address)
             
         # Убираем лишние пробелы
         address = ' '.join(address.split())
         
         # Разбиваем адрес на части
         parts = address.split()
-        print(f"\nЧасти адреса:")
-        print(f"  - {parts}")
+        _log.debug("Части адреса: %s", parts)
         
         # Если адрес состоит только из номера дома, возвращаем как есть
         if len(parts) == 1 and parts[0].isdigit():
-            print(f"Адрес состоит только из номера дома, возвращаем как есть")
+            _log.debug("Адрес состоит только из номера дома, возвращаем как есть")
             return address
             
         # Получаем номер дома (последнее число в адресе)
@@ -464,44 +797,39 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
                 
         # Убираем номер дома из адреса для обработки
         if house_number:
-            print(f"\nНомер дома: {house_number}")
+            _log.debug("Номер дома: %s", house_number)
             address = ' '.join(part for part in parts if part != house_number)
-            print(f"Адрес без номера дома:")
-            print(f"  - {address}")
+            _log.debug("Адрес без номера дома: %s", address)
         
         # Проверяем наличие префиксов территории
         territory_prefixes = ['ТЕР.']
-        print(f"\nПроверка префиксов территории:")
-        print(f"  - Доступные префиксы: {territory_prefixes}")
-        print(f"  - Текущий адрес: '{address}'")
-        
         has_territory_prefix = any(address.startswith(prefix) for prefix in territory_prefixes)
-        print(f"  - Найден префикс территории: {has_territory_prefix}")
+        _log.debug("Найден префикс территории: %s", has_territory_prefix)
         
         # Если адрес начинается с префикса территории, сохраняем его
         territory_prefix = None
         if has_territory_prefix:
-            print(f"\nОбнаружен префикс территории:")
             territory_prefix = next(prefix for prefix in territory_prefixes if address.startswith(prefix))
-            print(f"  - Префикс: {territory_prefix}")
             # Убираем префикс для дальнейшей обработки
             address = address[len(territory_prefix):].strip()
-            print(f"  - Адрес без префикса: {address}")
+            _log.debug("Префикс территории: %s, адрес без префикса: %s", territory_prefix, address)
         
-        # Проверяем каждое слово в адресе
+        # Проверяем каждое слово в адресе. Одно расширение подставляется один раз:
+        # "РОЗЫ ЛЮКСЕМБУРГ" не должно превращаться в "РОЗЫ ЛЮКСЕМБУРГ РОЗЫ ЛЮКСЕМБУРГ"
         result_parts = []
-        print(f"\nПрименение специальных правил:")
+        applied = set()  # Уже подставленные расширения
         for part in address.split():
-            found_rule = False
-            print(f"  - Проверка слова: '{part}'")
-            for old, new in self.SPECIAL_RULES.items():
-                if old in part:
-                    print(f"    - Найдено правило для слова '{part}': '{new}'")
-                    result_parts.append(new)
-                    found_rule = True
-                    break
-            if not found_rule:
-                print(f"    - Правило не найдено для слова '{part}', оставляем как есть")
+            match = cls._SPECIAL_RULES_RE.match(part)
+            if match:
+                new = cls.SPECIAL_RULES[match.group(match.lastindex)]
+                if new in applied:
+                    _log.debug("Расширение '%s' для слова '%s' уже подставлено, пропускаем", new, part)
+                    continue
+                _log.debug("Найдено правило для слова '%s': '%s'", part, new)
+                result_parts.append(new)
+                applied.add(new)
+            else:
+                _log.debug("Правило не найдено для слова '%s', оставляем как есть", part)
                 result_parts.append(part)
         
         # Собираем адрес обратно
@@ -510,16 +838,13 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
         # Если был префикс территории, добавляем его обратно
         if territory_prefix:
             expanded_address = f"{territory_prefix} {expanded_address}"
-            print(f"\nДобавлен префикс территории обратно:")
-            print(f"  - Адрес с префиксом: {expanded_address}")
+            _log.debug("Адрес с префиксом территории: %s", expanded_address)
         
         # Добавляем номер дома обратно, если он был
         if house_number:
             expanded_address = f"{expanded_address} {house_number}"
             
-        print(f"\nИтоговый расширенный адрес:")
-        print(f"  - {expanded_address}")
-        print(f"{'='*50}")
+        _log.debug("Итоговый расширенный адрес: %s", expanded_address)
         
         return expanded_address
 
@@ -536,75 +861,134 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
         if not address or not reference_addresses:
             return None
             
-        print(f"\nПоиск совпадения для адреса: {address}")
-        print(f"Количество адресов в справочнике: {len(reference_addresses)}")
+        _log.debug("Поиск совпадения для адреса: %s", address)
+        _log.debug("Количество адресов в справочнике: %s", len(reference_addresses))
         
-        # Сначала расширяем адрес с помощью правил
-        expanded_address = self._expand_address_with_rules(address)
-        print(f"Расширенный адрес: {expanded_address}")
+        # Расширяем адрес с помощью правил, нормализуем и разбиваем на слова
+        query = self._parse_address(address, expand=True)
+        _log.debug("Слова в нормализованном адресе: %s", query.word_set)
         
-        # Нормализуем расширенный адрес
-        normalized_address = self._normalize_address(expanded_address)
-        print(f"Нормализованный расширенный адрес: {normalized_address}")
+        index = self._get_reference_index(reference_addresses)
         
-        # Разбиваем нормализованный адрес на слова
-        address_words = set(normalized_address.upper().split())
-        print(f"Слова в нормализованном адресе: {address_words}")
+        # Полное совпадение слов дает наибольшую возможную оценку, поэтому оценивать остальные адреса не нужно
+        if query.words and query.words in index.exact:
+            _log.debug("Найдено точное совпадение: %s", index.exact[query.words])
+            return index.exact[query.words]
         
-        best_match = None
-        best_score = 0
+        # Оцениваются только адреса справочника, имеющие с искомым хотя бы одно общее слово
+        query_ids = np.array([index.vocab.get(word, -2) for word in query.words], dtype=np.int32)
+        known_ids = np.unique(query_ids[query_ids >= 0])
+        if known_ids.size == 0:
+            _log.debug("Итоговый результат: None (оценка: 0)")
+            return None
+        candidates = np.unique(np.concatenate([index.word_refs[word_id] for word_id in known_ids]))
+        _log.debug("Кандидатов в справочнике: %s", candidates.size)
         
-        for ref_addr in reference_addresses:
-            # Нормализуем адрес из справочника
-            ref_addr = self._normalize_address(ref_addr)
-            print(f"\nПроверка адреса из справочника: {ref_addr}")
-            
-            # Разбиваем адрес из справочника на слова
-            ref_words = set(ref_addr.upper().split())
-            print(f"Слова в адресе из справочника: {ref_words}")
-            
-            # Находим общие слова
-            common_words = address_words.intersection(ref_words)
-            print(f"Общие слова: {common_words}")
-            
-            if common_words:
-                # Вычисляем оценку совпадения
-                # Базовый вес за каждое совпадающее слово
-                score = len(common_words) * 2
-                
-                # Дополнительный вес за совпадение порядка слов
-                address_list = normalized_address.upper().split()
-                ref_list = ref_addr.upper().split()
-                
-                # Проверяем совпадение порядка слов
-                for i in range(min(len(address_list), len(ref_list))):
-                    if address_list[i] == ref_list[i]:
-                        score += 1
-                
-                # Дополнительный вес за совпадение начала адреса
-                if address_list and ref_list and address_list[0] == ref_list[0]:
-                    score += 2
-                
-                # Дополнительный вес за совпадение конца адреса
-                if address_list and ref_list and address_list[-1] == ref_list[-1]:
-                    score += 2
-                
-                # Дополнительный вес за совпадение длины адреса
-                if len(address_list) == len(ref_list):
-                    score += 1
-                
-                print(f"Оценка совпадения: {score}")
-                
-                if score > best_score:
-                    best_score = score
-                    best_match = ref_addr
-                    print(f"Новый лучший вариант: {best_match} (оценка: {best_score})")
+        # Оценка считается сразу для всех кандидатов:
+        # 2 за каждое общее слово, 1 за каждое совпадение слова на той же позиции,
+        # по 2 за совпадение первого и последнего слова и 1 за совпадение длины адреса
+        tokens = index.tokens[candidates]
+        width = min(query_ids.size, tokens.shape[1])
+        scores = np.isin(index.unique_tokens[candidates], known_ids).sum(axis=1) * 2
+        scores += (tokens[:, :width] == query_ids[:width]).sum(axis=1)
+        scores += (tokens[:, 0] == query_ids[0]) * 2
+        scores += (index.last_tokens[candidates] == query_ids[-1]) * 2
+        scores += index.lengths[candidates] == query_ids.size
         
-        print(f"\nИтоговый результат: {best_match} (оценка: {best_score})")
+        # Кандидаты упорядочены по номеру в справочнике, argmax вернет первый из лучших
+        best = int(np.argmax(scores))
+        best_match = index.canonical[candidates[best]]
+        
+        _log.debug("Итоговый результат: %s (оценка: %s)", best_match, scores[best])
         return best_match
 
-    def _normalize_address(self, address: str) -> str:
-        """Нормализует адрес для поиска.
+    def _get_reference_index(self, reference_addresses: list[str]) -> ReferenceIndex:
+        """Возвращает индекс справочника, перестраивая его только при смене списка адресов.
+
+        Args:
+            reference_addresses (list[str]): Список адресов из справочника.
+
+        Returns:
+            ReferenceIndex: Индекс справочника.
+        """
+
+        cached = self._reference_index
+        if cached is None or cached[0] is not reference_addresses or cached[1] != len(reference_addresses):
+            cached = (reference_addresses, len(reference_addresses), self._build_reference_index(reference_addresses))
+            self._reference_index = cached
+        return cached[2]
+
+    @classmethod
+    def _build_reference_index(cls, reference_addresses: list[str]) -> ReferenceIndex:
+        """Разбирает адреса справочника и строит по ним индекс: словарь слов, матрицы номеров слов
+        для векторной оценки совпадений и обратный индекс "слово -> номера адресов".
+
+        Args:
+            reference_addresses (list[str]): Список адресов из справочника.
+
+        Returns:
+            ReferenceIndex: Индекс справочника.
+        """
+
+        parsed_refs = [cls._parse_address(ref_addr) for ref_addr in reference_addresses]
+        vocab = {}
+        exact = {}
+        word_refs = []
+        for ref_id, parsed in enumerate(parsed_refs):
+            exact.setdefault(parsed.words, parsed.canonical)
+            for word in parsed.word_set:
+                word_id = vocab.setdefault(word, len(vocab))
+                if word_id == len(word_refs):
+                    word_refs.append([])
+                word_refs[word_id].append(ref_id)
+
+        # Матрицы дополняются значением -1, которое не совпадает ни с одним номером слова
+        count = len(parsed_refs)
+        width = max((len(parsed.words) for parsed in parsed_refs), default=0) or 1
+        unique_width = max((len(parsed.word_set) for parsed in parsed_refs), default=0) or 1
+        tokens = np.full((count, width), -1, dtype=np.int32)
+        unique_tokens = np.full((count, unique_width), -1, dtype=np.int32)
+        lengths = np.zeros(count, dtype=np.int32)
+        for ref_id, parsed in enumerate(parsed_refs):
+            tokens[ref_id, :len(parsed.words)] = [vocab[word] for word in parsed.words]
+            unique_tokens[ref_id, :len(parsed.word_set)] = [vocab[word] for word in parsed.word_set]
+            lengths[ref_id] = len(parsed.words)
+        last_tokens = tokens[np.arange(count), np.maximum(lengths - 1, 0)]
+
+        return ReferenceIndex(
+            canonical=[parsed.canonical for parsed in parsed_refs],
+            exact=exact,
+            vocab=vocab,
+            word_refs=[np.array(refs, dtype=np.int64) for refs in word_refs],
+            tokens=tokens,
+            unique_tokens=unique_tokens,
+            last_tokens=last_tokens,
+            lengths=lengths,
+        )
+
+    @classmethod
+    @lru_cache(maxsize=131072)
+    def _parse_address(cls, address: str, expand: bool = False) -> ParsedAddress:
+        """Нормализует адрес и разбивает его на слова. Результат кэшируется.
+
+        Args:
+            address (str): Исходный адрес.
+            expand (bool, optional): Расширять ли адрес правилами перед нормализацией. По умолчанию = False.
+
+        Returns:
+            ParsedAddress: Нормализованный адрес и его слова.
+        """
+
+        if expand:
+            address = cls._expand_address_with_rules(address)
+        canonical = cls._normalize_address(address)
+        words = tuple(canonical.upper().split())
+        return ParsedAddress(canonical, words, frozenset(words))
+
+    @classmethod
+    @lru_cache(maxsize=131072)
+    def _normalize_address(cls, address: str) -> str:
+        """Нормализует адрес для поиска. Результат кэшируется.
         
         Args:
             address (str): Исходный адрес.
@@ -615,32 +999,15 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
         if not address:
             return ""
             
-        print(f"\nОбработка адреса: {address}")
+        _log.debug("Обработка адреса: %s", address)
             
         # Приводим к верхнему регистру
         address = address.upper()
-        print(f"После приведения к верхнему регистру: {address}")
-        
-        # Заменяем различные варианты написания на стандартные
-        replacements = {
-            'УЛИЦА': 'УЛ.',
-            'УЛ ': 'УЛ.',
-            'УЛ.': 'УЛ.',
-            'ПРОСПЕКТ': 'ПР-КТ',
-            'ПРОСП': 'ПР-КТ',
-            'ПР-Т': 'ПР-КТ',
-            'ПРОЕЗД': 'ПР-Д',
-            'ПР.': 'ПР-Д',
-            'БУЛЬВАР': 'Б-Р',
-            'БУЛ': 'Б-Р',
-            'ПЛОЩАДЬ': 'ПЛ.',
-            'ПЛ ': 'ПЛ.',
-        }
-        
-        # Применяем замены
-        for old, new in replacements.items():
-            address = address.replace(old, new)
-        print(f"После замены сокращений: {address}")
+        _log.debug("После приведения к верхнему регистру: %s", address)
+        
+        # Заменяем различные варианты написания на стандартные за один проход
+        address = cls._ABBREVIATIONS_RE.sub(lambda match: cls.ABBREVIATIONS[match.group(0)], address)
+        _log.debug("После замены сокращений: %s", address)
             
         # Убираем лишние пробелы
         address = ' '.join(address.split())
@@ -651,11 +1018,11 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
             if address.startswith(prefix):
                 address = address[len(prefix):].strip()
                 break
-        print(f"После удаления префиксов: {address}")
+        _log.debug("После удаления префиксов: %s", address)
         
         # Разбиваем адрес на части
         parts = address.split()
-        print(f"Части адреса: {parts}")
+        _log.debug("Части адреса: %s", parts)
         
         # Если адрес состоит только из номера дома, возвращаем как есть
         if len(parts) == 1 and parts[0].isdigit():
@@ -671,20 +1038,23 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
         # Убираем номер дома из адреса для обработки
         if house_number:
             address = ' '.join(part for part in parts if part != house_number)
-            print(f"Адрес без номера дома: {address}")
+            _log.debug("Адрес без номера дома: %s", address)
         
-        # Проверяем каждое слово в адресе
+        # Проверяем каждое слово в адресе; одно расширение подставляется один раз
         result_parts = []
+        applied = set()  # Уже подставленные расширения
         for part in address.split():
-            found_rule = False
-            for old, new in self.SPECIAL_RULES.items():
-                if old in part:
-                    print(f"Найдено правило для слова {part}: {new}")
-                    result_parts.append(new)
-                    found_rule = True
-                    break
-            if not found_rule:
-                print(f"Правило не найдено для слова {part}, оставляем как есть")
+            match = cls._SPECIAL_RULES_RE.match(part)
+            if match:
+                new = cls.SPECIAL_RULES[match.group(match.lastindex)]
+                if new in applied:
+                    _log.debug("Расширение %s для слова %s уже подставлено, пропускаем", new, part)
+                    continue
+                _log.debug("Найдено правило для слова %s: %s", part, new)
+                result_parts.append(new)
+                applied.add(new)
+            else:
+                _log.debug("Правило не найдено для слова %s, оставляем как есть", part)
                 result_parts.append(part)
         
         # Собираем адрес обратно
@@ -694,6 +1064,6 @@ class ImprovedDatabaseOutputWorker(OutputWorker):
         if house_number:
             normalized_address = f"{normalized_address} {house_number}"
             
-        print(f"Итоговый нормализованный адрес: {normalized_address}")
+        _log.debug("Итоговый нормализованный адрес: %s", normalized_address)
         
         return normalized_address 
\ No newline at end of file
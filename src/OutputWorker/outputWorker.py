@@ -1,84 +1,358 @@
 __all__ = [
     "OutputWorker",
     "SingleTableExcelOutputWorker",
+    "RawXMLExcelOutputWorker",
     "AddressDTO",
     "LoggersCollection",
     "GUILogger",
+    "BufferedLogger",
     "DatabaseOutputWorker"
 ]
 
 from abc import ABC, abstractmethod
-from typing import Any, Iterable, Iterator
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import io
+import itertools
+import logging
+import math
+import queue
 import sys
-from tkinter import Listbox
+import threading
 import time
 
-import pandas as pd
-from sqlalchemy import Engine, Integer, create_engine, MetaData, Table, Column, String, text
+from openpyxl import Workbook
+from sqlalchemy import Engine, Integer, create_engine, event, make_url, MetaData, Table, Column, String, text
+from sqlalchemy.pool import QueuePool
 from sqlalchemy import inspect  # Добавляем импорт для инспекции структуры БД
 
 from ..AddresInfo import Address
+from .xlsx_writer import XLSXStreamWriter
+
+if TYPE_CHECKING:
+    # Tkinter нужен только для аннотаций GUILogger; при работе без GUI он не загружается
+    from tkinter import Listbox
+
+_log = logging.getLogger(__name__)
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[list]:
+    """Разбивает поток элементов на списки заданного размера.
+
+    Args:
+        items (Iterable): Поток элементов.
+        size (int): Размер списка.
+
+    Yields:
+        list: Очередная порция элементов.
+    """
+
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _copy_rows(conn, sql: str, rows: list[tuple]):
+    """Загружает строки командой COPY ... FROM STDIN в текстовом формате PostgreSQL.
+
+    Args:
+        conn: Соединение SQLAlchemy, внутри транзакции которого выполняется загрузка.
+        sql (str): Команда COPY ... FROM STDIN.
+        rows (list[tuple]): Загружаемые строки.
+    """
+
+    def format_value(value: Any) -> str:
+        if value is None:
+            return '\\N'
+        return (str(value)
+                .replace('\\', '\\\\')
+                .replace('\t', '\\t')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r'))
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(map(format_value, row)))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(sql, buffer)
+    finally:
+        cursor.close()
+
+
+def _ensure_index(engine, schema: str, table_name: str, column_name: str, expression: str | None = None):
+    """Создает индекс по колонке таблицы PostgreSQL (или по выражению от нее), если подходящего индекса еще нет.
+    Без индекса каждый UPDATE ... FROM с условием по этой колонке просматривает всю таблицу.
+
+    Это единственное изменение входной таблицы, кроме колонки для ключей: ее структура и данные не меняются.
+
+    Индекс строится через CREATE INDEX CONCURRENTLY, который, в отличие от обычного CREATE INDEX,
+    не блокирует запись в таблицу на время построения. CONCURRENTLY нельзя выполнить в блоке транзакции,
+    поэтому команды выполняются на отдельном соединении в режиме AUTOCOMMIT.
+    Индекс - только ускорение, поэтому ошибка (например, нет прав) не прерывает сохранение.
+
+    Args:
+        engine: Движок БД.
+        schema (str): Схема таблицы.
+        table_name (str): Имя таблицы.
+        column_name (str): Имя колонки.
+        expression (str | None, optional): SQL-выражение от колонки, по которому строится индекс;
+            оно должно в точности совпадать с выражением в условии запроса. None - индекс по самой колонке. Defaults to None.
+    """
+
+    table = f'"{schema}"."{table_name}"'
+    index_name = f'{table_name}_{column_name}_{"expr_" if expression else ""}idx'
+    # Подходит любой готовый индекс, первая колонка которого - column_name
+    column_sql = (
+        "SELECT 1 FROM pg_index i "
+        "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0] "
+        "WHERE i.indrelid = %(table)s::regclass AND a.attname = %(column)s AND i.indisvalid LIMIT 1"
+    )
+    # Состояние индекса index_name этой таблицы: None - его нет, False - не достроен (INVALID)
+    state_sql = (
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = %(table)s::regclass AND c.relname = %(index)s"
+    )
+    params = {'table': table, 'column': column_name, 'index': index_name}
+    try:
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            # Индекс по выражению ищется только по имени
+            if expression is None and conn.exec_driver_sql(column_sql, params).first() is not None:
+                return
+            state = conn.exec_driver_sql(state_sql, params).scalar()
+            if state:
+                return
+            print(f"Создание индекса по колонке {column_name}...")
+            # Прерванное построение CONCURRENTLY оставляет нерабочий индекс, который IF NOT EXISTS не заменит
+            if state is False:
+                conn.exec_driver_sql(f'DROP INDEX CONCURRENTLY IF EXISTS "{schema}"."{index_name}"')
+            key = f'({expression})' if expression else f'"{column_name}"'
+            conn.exec_driver_sql(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index_name}" ON {table} ({key})')
+    except Exception as e:
+        print(f"Не удалось создать индекс по колонке {column_name}: {e}")
 
 
 class LoggersCollection(list):
     """Позволяет одновременно писать логи в несколько источников. Для добавления нового источника используется стандартный интерфейс списка."""
 
+    def _sink_methods(self, *names: str) -> tuple:
+        """Возвращает методы источников логирования с заданным именем.
+
+        Методы ищутся один раз и кэшируются до изменения состава источников.
+
+        Args:
+            *names (str): Имя метода и, при необходимости, запасные имена на случай его отсутствия.
+
+        Returns:
+            tuple: Связанные методы источников в порядке их следования в списке.
+        """
+        cache = self.__dict__.setdefault('_methods_cache', {})
+        methods = cache.get(names)
+        if methods is None:
+            resolved = []
+            for obj in self:
+                for name in names:
+                    method = getattr(obj, name, None)
+                    if method is not None:
+                        resolved.append(method)
+                        break
+            methods = cache[names] = tuple(resolved)
+        return methods
+
+    def _drop_methods_cache(self):
+        """Сбрасывает кэш методов источников; вызывается при изменении списка."""
+        self.__dict__.pop('_methods_cache', None)
+
     def write(self, message: str):
         """Записывает сообщение во все источники логирования.
         
         Args:
             message (str): Сообщение для записи.
         """
-        for obj in self:
-            if hasattr(obj, 'write'):
-                obj.write(message)
-            elif hasattr(obj, 'append'):
-                obj.append(message)
+        for write in self._sink_methods('write', 'append'):
+            write(message)
 
     def flush(self):
         """Вызывает flush для всех источников логирования."""
-        for obj in self:
-            if hasattr(obj, 'flush'):
-                obj.flush()
+        for flush in self._sink_methods('flush'):
+            flush()
 
     def __getattr__(self, attr: str):
         """Получение атрибута по его имени. Используется для выполнения операций записи логов во все места, имеющие единый интерфейс сразу.
 
+        Созданная функция сохраняется в экземпляре, поэтому повторные обращения не попадают в __getattr__.
+
         Args:
             attr (str): Название аттрибута (метода).
         """
+        sink_methods = self._sink_methods
+
         def func(*args, **kwargs):
-            for obj in self:
-                if hasattr(obj, attr):
-                    getattr(obj, attr)(*args, **kwargs)
+            for method in sink_methods(attr):
+                method(*args, **kwargs)
+        self.__dict__[attr] = func
         return func
 
 
-class GUILogger:
+def _dropping_methods_cache(name: str):
+    """Оборачивает изменяющий метод списка так, чтобы он сбрасывал кэш методов LoggersCollection."""
+    list_method = getattr(list, name)
+
+    def method(self, *args, **kwargs):
+        self._drop_methods_cache()
+        return list_method(self, *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = list_method.__doc__
+    return method
+
+
+for _name in ('append', 'extend', 'insert', 'remove', 'pop', 'clear', 'sort', 'reverse',
+              '__setitem__', '__delitem__', '__iadd__', '__imul__'):
+    setattr(LoggersCollection, _name, _dropping_methods_cache(_name))
+del _name
+
+
+class BufferedLogger(ABC):
+    """Основа для логгеров, выводящих сообщения в виджет: сообщения копятся в очереди и выводятся пакетом.
+
+    Очередь сбрасывается при накоплении FLUSH_EVERY сообщений, а также если с прошлого вывода прошло
+    больше FLUSH_INTERVAL секунд, поэтому одиночные сообщения появляются сразу. Если очередь не сброшена
+    сразу, вывод планируется через after виджета не позже чем через FLUSH_INTERVAL секунд, поэтому
+    сообщения не остаются в очереди, даже если после них ничего не пишется.
+
+    Виджеты Tk можно изменять только из главного потока. Если flush() вызван из другого потока
+    (например, из потока обработки), вывод пакета планируется через after_idle виджета и выполняется
+    главным циклом Tk; до вывода запланированного пакета повторно он не планируется.
+    """
+
+    # Максимальное количество сообщений в очереди
+    FLUSH_EVERY = 1000
+
+    # Интервал (в секундах), после которого очередное сообщение выводится без ожидания заполнения очереди
+    FLUSH_INTERVAL = 0.5
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._last_flush = 0.0
+        self._drain_scheduled = False
+        self._timer_scheduled = False
+        self._schedule_lock = threading.Lock()
+
+    def write(self, message):
+        self._queue.put(message)
+        if self._queue.qsize() >= self.FLUSH_EVERY or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
+        else:
+            self._schedule_timed_flush()
+
+    def _schedule_timed_flush(self):
+        """Планирует вывод очереди через FLUSH_INTERVAL секунд (один раз до его выполнения)."""
+        widget = self._tk_widget()
+        if widget is None:
+            # Без виджета вывод некому отложить
+            self.flush()
+            return
+
+        with self._schedule_lock:
+            if self._timer_scheduled:
+                return
+            self._timer_scheduled = True
+        try:
+            widget.after(int(self.FLUSH_INTERVAL * 1000), self._timed_flush)
+        except Exception:
+            # Главный цикл Tk уже остановлен: сообщения остаются в очереди до явного flush()
+            self._timer_scheduled = False
+
+    def _timed_flush(self):
+        """Выполняется главным циклом Tk по таймеру, запланированному _schedule_timed_flush."""
+        self._timer_scheduled = False
+        self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if self._queue.empty():
+            return
+
+        widget = self._tk_widget()
+        if widget is None or threading.current_thread() is threading.main_thread():
+            self._drain()
+            return
+
+        with self._schedule_lock:
+            if self._drain_scheduled:
+                return
+            self._drain_scheduled = True
+        try:
+            widget.after_idle(self._drain)
+        except Exception:
+            # Главный цикл Tk уже остановлен: сообщения остаются в очереди
+            self._drain_scheduled = False
+
+    def _drain(self):
+        """Забирает все накопленные сообщения и выводит их одним пакетом."""
+        # Флаг сбрасывается до чтения очереди: сообщения, поступившие позже, запланируют новый вывод
+        self._drain_scheduled = False
+        messages = []
+        while True:
+            try:
+                messages.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if messages:
+            self._emit(messages)
+
+    def _tk_widget(self):
+        """Возвращает виджет, через главный цикл которого выводятся сообщения (None, если виджета нет)."""
+        return None
+
+    @abstractmethod
+    def _emit(self, messages: list[str]):
+        """Выводит пакет сообщений в виджет.
+
+        Args:
+            messages (list[str]): Сообщения в порядке их поступления.
+        """
+
 
-    def __init__(self, listbox: Listbox = None):
+class GUILogger(BufferedLogger):
+
+    def __init__(self, listbox: "Listbox" = None):
+        super().__init__()
         self.widget = listbox
 
 
     @property
-    def listbox(self) -> Listbox:
+    def listbox(self) -> "Listbox":
         return self.widget
     
     @listbox.setter
     def listbox(self, value):
         self.widget = value
 
-    def write(self, message):
-        if self.widget is not None:
-            self.widget.insert(0, message)
+    def _tk_widget(self):
+        return self.widget
 
-    def flush(self):
-        pass
+    def _emit(self, messages: list[str]):
+        # Новые сообщения выводятся сверху: пакет вставляется одним вызовом в обратном порядке
+        if self.widget is not None:
+            self.widget.insert(0, *reversed(messages))
 
 
 class AddressDTO:
     """DTO для передачи данных об адресе."""
 
+    # Записей в одном прогоне миллионы: слоты вместо __dict__ экономят память и ускоряют доступ к полям.
+    # Дополнительные поля хранятся в одном словаре _extras и доступны как атрибуты через __getattr__
+    __slots__ = ('raw', 'address', 'key', 'note', 'Name', 'Type', 'House', 'Flat', '_extras')
+
+    # Порядок основных колонок вывода; значения в этом порядке возвращает to_row()
+    COLUMNS = ("Address", "Name", "Type", "House", "Flat", "Key")
+
     def __init__(self, raw: str, address: Address | None = None, key: Any = None, **kwargs):
         """Конструктор.
 
@@ -91,49 +365,83 @@ class AddressDTO:
         self.raw = raw
         self.address = address
         self.key = key
-        self.note = kwargs.get('note')
+        self.note = kwargs.pop('note', None)
         
         # Дополнительные поля для соответствия структуре справочника
         if address:
-            self.Name = address.street.name if address.street else None
-            self.Type = str(address.street.type) if address.street and address.street.type else None
+            street = address.street
+            street_type = street.type if street else None
+            self.Name = street.name if street else None
+            # Строки типов улиц интернированы в StreetType, str() их только возвращает
+            self.Type = str(street_type) if street_type else None
             self.House = address.house
             self.Flat = address.flat
         else:
-            self.Name = None
-            self.Type = None
-            self.House = None
-            self.Flat = None
+            self.Name = self.Type = self.House = self.Flat = None
             
-        # Добавляем все дополнительные поля
-        for key, value in kwargs.items():
-            if key != 'raw' and key != 'address' and key != 'key' and key != 'note':
-                setattr(self, key, value)
-                print(f"Установлен атрибут '{key}' = {value}")
+        # Остальные именованные аргументы - дополнительные поля (raw, address и key в kwargs не попадают)
+        self._extras = kwargs
 
-    def dict(self) -> dict:
+    def __getattr__(self, name: str) -> Any:
+        """Возвращает дополнительное поле записи как атрибут.
+
+        Args:
+            name (str): Имя поля.
+
+        Raises:
+            AttributeError: Поле не задано.
+
+        Returns:
+            Any: Значение поля.
+        """
+        # _extras может отсутствовать, пока объект не инициализирован (например, при копировании)
+        if name == '_extras':
+            raise AttributeError(name)
+        try:
+            return self._extras[name]
+        except KeyError:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'") from None
+
+    def dict(self, extra_fields: Iterable[str] | None = None) -> dict:
         """Преобразует DTO к словарю нужного для вывода формата.
 
+        Args:
+            extra_fields (Iterable[str] | None, optional): Заранее вычисленные имена дополнительных полей
+                (см. extra_fields()). У всех записей одного прогона они совпадают, поэтому при преобразовании
+                многих записей их стоит вычислить один раз. Defaults to None - поля определяются по самой записи.
+
         Returns:
             dict: Словарь в нужном для вывода формате.
         """
         # Начинаем с базовых полей
-        data = {
-            "Address": self.raw,
-            "Name": self.Name,
-            "Type": self.Type,
-            "House": self.House,
-            "Flat": self.Flat,
-            "Key": self.key
-        }
+        data = dict(zip(self.COLUMNS, self.to_row()))
         
-        # Добавляем все дополнительные поля, кроме служебных
-        for key, value in self.__dict__.items():
-            if key not in ['raw', 'address', 'key', 'note', 'Name', 'Type', 'House', 'Flat']:
-                data[key] = value
+        # Добавляем дополнительные поля
+        extras = self._extras
+        if extra_fields is None:
+            data.update(extras)
+        else:
+            for key in extra_fields:
+                data[key] = extras.get(key)
                 
         return data
 
+    def to_row(self) -> tuple:
+        """Возвращает значения основных колонок в порядке COLUMNS.
+
+        Returns:
+            tuple: Адрес, имя улицы, тип, дом, квартира, ключ.
+        """
+        return (self.raw, self.Name, self.Type, self.House, self.Flat, self.key)
+
+    def extra_fields(self) -> list[str]:
+        """Возвращает имена дополнительных полей записи (переданных через **kwargs).
+
+        Returns:
+            list[str]: Имена полей в порядке их установки.
+        """
+        return list(self._extras)
+
 
     def __str__(self) -> str:
         """Строковое представление содердимого объекта.
@@ -148,8 +456,8 @@ class AddressDTO:
 
         if self.key is not None:
             result += f"; Ключ: {self.key}"
-        if len(self.__dict__) > 0:
-            result += f"; Доп. данные: {self.__dict__}"
+        if self._extras:
+            result += f"; Доп. данные: {self._extras}"
         
         return result
 
@@ -178,7 +486,14 @@ class OutputWorker(ABC):
 
 
 class SingleTableExcelOutputWorker(OutputWorker):
-    """Выводит все результаты в один лист excel."""
+    """Выводит все результаты в один лист excel.
+
+    Может использоваться как контекстный менеджер: тогда книга открывается один раз, каждый вызов save()
+    дописывает строки в тот же лист, а файл записывается при выходе из блока with.
+    """
+
+    # Начиная с этого количества записей xlsx формируется XLSXStreamWriter, а не openpyxl
+    STREAM_XML_THRESHOLD = 100_000
 
     def __init__(self, output_path: str, logger: LoggersCollection):
         """Конструктор.
@@ -190,52 +505,212 @@ class SingleTableExcelOutputWorker(OutputWorker):
 
         super().__init__(logger)
         self.output_path = output_path
+        # Книга и лист, открытые в блоке with, и дополнительные колонки, определенные по первой записи
+        self._workbook = None
+        self._sheet = None
+        self._extra_fields = None
 
+    def __enter__(self):
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet('Sheet1')
+        self._extra_fields = None
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        workbook = self._workbook
+        self._workbook = self._sheet = self._extra_fields = None
+        # При ошибке файл не перезаписывается, как и при обычном save()
+        if exc_type is None:
+            workbook.save(self.output_path)
+        return False
 
     def save(self, addresses: Iterable[AddressDTO]):
         """Сохраняет данные в файл excel в одну таблицу.
 
+        Внутри блока with строки дописываются в открытую книгу, иначе файл записывается сразу.
+
         Args:
             addresses (Iterable[AddressDTO]): Коллекция с адресами и их ключами.
         """
 
         try:
-            # Преобразуем данные в список словарей
-            rows = []
-            for item in addresses:
-                row = {
-                    'Address': item.raw,  # Сырой адрес
-                    'Name': item.Name,    # Имя улицы
-                    'Type': item.Type,    # Тип улицы
-                    'House': item.House,  # Номер дома
-                    'Flat': item.Flat,    # Номер квартиры
-                    'Key': item.key,      # Ключ
-                    'Note': item.note     # Примечание
-                }
-                # Добавляем дополнительные поля
-                for key, value in item.__dict__.items():
-                    if key not in ['raw', 'address', 'key', 'note', 'Name', 'Type', 'House', 'Flat']:
-                        row[key] = value
-                rows.append(row)
+            if self._sheet is not None:
+                addresses = iter(addresses)
+                if self._extra_fields is None:
+                    first = next(addresses, None)
+                    if first is None:
+                        return
+                    self._extra_fields = first.extra_fields()
+                    self._sheet.append([*AddressDTO.COLUMNS, 'Note', *self._extra_fields])
+                    addresses = itertools.chain([first], addresses)
+                self._append_rows(self._sheet, self._rows(addresses, self._extra_fields))
+                return
+
+            # Начало выгрузки буферизуется: по нему выбирается способ записи и определяется
+            # состав дополнительных колонок (по первой записи)
+            addresses = iter(addresses)
+            head = list(itertools.islice(addresses, self.STREAM_XML_THRESHOLD))
+            extra_fields = head[0].extra_fields() if head else []
+            header = [*AddressDTO.COLUMNS, 'Note', *extra_fields]
+            rows = self._rows(itertools.chain(head, addresses), extra_fields)
+
+            if len(head) >= self.STREAM_XML_THRESHOLD:
+                # Большая выгрузка: XML листа формируется напрямую, минуя openpyxl
+                XLSXStreamWriter(self.output_path).write(header, rows)
+                return
+
+            # Строки пишутся в книгу в потоковом режиме openpyxl (write_only), без промежуточного DataFrame
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet('Sheet1')
+            if head:
+                sheet.append(header)
+            self._append_rows(sheet, rows)
             
-            # Создаем DataFrame и сохраняем в Excel
-            df = pd.DataFrame(rows)
-            df.to_excel(self.output_path, index=False)
+            workbook.save(self.output_path)
         except Exception as e:
             self.logger.write(f"Ошибка при сохранении результатов: {str(e)}\n")
             raise e
+        finally:
+            self.logger.flush()
+
+    @staticmethod
+    def _rows(addresses: Iterable[AddressDTO], extra_fields: list[str]) -> Iterator[tuple]:
+        """Формирует строки листа: основные колонки, примечание и дополнительные поля.
+
+        Args:
+            addresses (Iterable[AddressDTO]): Коллекция с адресами и их ключами.
+            extra_fields (list[str]): Дополнительные поля, выводимые после основных колонок.
+
+        Yields:
+            tuple: Значения очередной строки.
+        """
+        for item in addresses:
+            yield (*item.to_row(), item.note, *[getattr(item, key, None) for key in extra_fields])
+
+    @staticmethod
+    def _append_rows(sheet, rows: Iterable[tuple]):
+        """Дописывает строки в лист книги openpyxl.
+
+        Args:
+            sheet: Лист книги в режиме write_only.
+            rows (Iterable[tuple]): Значения строк.
+        """
+        for row in rows:
+            # Пропуски (NaN из pandas) записываются пустыми ячейками, как в DataFrame.to_excel
+            sheet.append([None if isinstance(value, float) and math.isnan(value) else value
+                          for value in row])
+
+
+class RawXMLExcelOutputWorker(SingleTableExcelOutputWorker):
+    """Выводит все результаты в один лист excel, всегда формируя XML листа напрямую (XLSXStreamWriter).
+
+    Предназначен для заведомо больших выгрузок: openpyxl не используется независимо от количества записей.
+    """
+
+    # Достаточно одной записи, чтобы определить дополнительные колонки и выбрать прямую запись XML
+    STREAM_XML_THRESHOLD = 1
 
 
 class DatabaseOutputWorker(OutputWorker):
     """ Класс для записи результатов в БД. """
 
-    def __init__(self, engine: Engine, input_table_name: str, output_table_name: str, schema: str, id_column: str | None, logger: LoggersCollection):
+    # Количество адресов, записываемых в выходную таблицу за один раз
+    CHUNK_SIZE = 10_000
+
+    # Колонки выходной таблицы, заполняемые из AddressDTO.to_row() (в том же порядке)
+    OUTPUT_COLUMNS = ('raw_address', 'street_name', 'street_type', 'house', 'flat', 'key')
+
+    # Соединений в пуле на один поток записи
+    POOL_CONNECTIONS_PER_WORKER = 2
+
+    # SQLite допускает только одного писателя: сохранения в нее выполняются по очереди
+    _SQLITE_WRITE_LOCK = threading.Lock()
+
+    def __init__(self, engine: Engine, input_table_name: str, output_table_name: str, schema: str, id_column: str | None, logger: LoggersCollection, write_workers: int = 1, batch_size: int = 10_000):
+        """Конструктор.
+
+        Args:
+            engine (Engine): Подключение к БД.
+            input_table_name (str): Имя входной таблицы.
+            output_table_name (str): Имя выходной таблицы.
+            schema (str): Схема БД.
+            id_column (str | None): Имя колонки с ID.
+            logger (LoggersCollection): Объект для логирования.
+            write_workers (int, optional): Количество фоновых потоков записи в выходную таблицу. Каждая порция
+                записывается в своей транзакции своим соединением, поэтому пул движка должен вмещать
+                столько соединений (см. from_url). Для SQLite запись по умолчанию выполняется в текущем потоке (см. background_write). Defaults to 1.
+            batch_size (int, optional): Количество ключей, обновляемых во входной таблице одним запросом. Defaults to 10_000.
+        """
         super().__init__(logger)
         self.engine = engine
         self.input_table_name = input_table_name
         self.output_table_name = output_table_name
         self.schema = schema
         self.id_column = id_column
+        self.write_workers = write_workers
+        self.batch_size = batch_size
+        self._write_lock = self._SQLITE_WRITE_LOCK if engine.dialect.name == 'sqlite' else contextlib.nullcontext()
+        # Записывать ли порции выходной таблицы в фоновых потоках. SQLite допускает одного писателя,
+        # поэтому для нее по умолчанию запись выполняется в текущем потоке
+        self.background_write = engine.dialect.name != 'sqlite'
+        # Метаданные схемы загружаются при первом сохранении и переиспользуются последующими:
+        # структура схемы считается неизменной на время жизни обработчика (кроме изменений, внесенных им самим)
+        self._tables = None  # Имена таблиц схемы
+        self._input_columns = None  # {имя колонки входной таблицы в нижнем регистре: имя колонки}
+
+    @classmethod
+    def from_url(cls, url: str, workers: int, *args, **kwargs):
+        """Создает обработчик вместе с движком БД, пул которого рассчитан на заданное число потоков.
+
+        Конструктор принимает уже готовый движок; если запись ведется из нескольких потоков,
+        вызывающий код должен передать движок с пулом соединений, иначе потоки будут ждать
+        друг друга. Этот метод создает такой движок: QueuePool размером в два соединения
+        на поток, проверка соединений перед выдачей из пула и пакетное выполнение executemany.
+
+        Args:
+            url (str): Строка подключения к БД.
+            workers (int): Количество потоков, одновременно работающих с БД. Если write_workers
+                не передан, столько же потоков записывают выходную таблицу.
+            *args, **kwargs: Остальные аргументы конструктора (без engine).
+
+        Returns:
+            Экземпляр обработчика.
+        """
+        url = make_url(url)
+        connect_args = {}
+        # Вставки пакетами выполняются многострочными INSERT ... VALUES по 1000 строк
+        engine_options = {'insertmanyvalues_page_size': 1000}
+        is_sqlite = url.get_backend_name() == 'sqlite'
+        if is_sqlite:
+            # Соединения пула передаются между потоками
+            connect_args['check_same_thread'] = False
+        elif url.get_backend_name() == 'postgresql' and url.get_driver_name() == 'psycopg2':
+            # Пакетные UPDATE/DELETE через execute_batch, INSERT - многострочными VALUES
+            engine_options['executemany_mode'] = 'values_plus_batch'
+        elif url.get_backend_name() == 'mssql' and url.get_driver_name() == 'pyodbc':
+            # pyodbc передает пакет параметров на сервер одним массивом (bulk-вставка драйвера)
+            engine_options['fast_executemany'] = True
+
+        engine = create_engine(
+            url,
+            poolclass=QueuePool,
+            pool_size=max(1, workers) * cls.POOL_CONNECTIONS_PER_WORKER,
+            max_overflow=0,
+            pool_pre_ping=True,
+            connect_args=connect_args,
+            **engine_options,
+        )
+
+        if is_sqlite:
+            @event.listens_for(engine, 'connect')
+            def _enable_wal(dbapi_connection, connection_record):
+                # WAL позволяет читателям работать параллельно с записью
+                cursor = dbapi_connection.cursor()
+                cursor.execute('PRAGMA journal_mode=WAL')
+                cursor.close()
+
+        kwargs.setdefault('write_workers', workers)
+        return cls(engine, *args, **kwargs)
 
     def save(self, addresses: Iterable[AddressDTO]):
         """Сохраняет данные в базу данных.
@@ -243,64 +718,30 @@ class DatabaseOutputWorker(OutputWorker):
         Args:
             addresses (Iterable[AddressDTO]): Коллекция с адресами и их ключами.
         """
+        try:
+            with self._write_lock:
+                self._save(addresses)
+        finally:
+            # Сообщения, накопленные логгерами за время сохранения, выводятся одним пакетом
+            self.logger.flush()
+
+    def _save(self, addresses: Iterable[AddressDTO]):
+        """Выполняет сохранение; вызывается из save() под блокировкой записи. """
         try:
             print(f"\n===== НАЧАЛО ПРОЦЕССА СОХРАНЕНИЯ =====")
             print(f"Схема: {self.schema}")
             print(f"Входная таблица: {self.input_table_name}")
             
-            # ЭТАП 1: СОХРАНЕНИЕ ДАННЫХ В ВЫХОДНУЮ ТАБЛИЦУ
-            # ------------------------------------------
-            # Собираем данные для выходной таблицы и информацию для обновления ключей
-            output_data = []
-            update_data = []
-            
-            # Преобразуем входной поток в списки с проверкой типов
-            print("Обработка входных данных...")
-            for item in addresses:
-                # Показываем для отладки значение ключа
-                print(f"Обработка записи: raw={item.raw}, key={item.key}")
-                
-                # Данные для выходной таблицы
-                output_data.append({
-                    'raw_address': item.raw,
-                    'street_name': item.Name,
-                    'street_type': item.Type,
-                    'house': item.House,
-                    'flat': item.Flat,
-                    'key': item.key
-                })
-                
-                # Данные для обновления входной таблицы
-                if item.key is not None and self.id_column is not None:
-                    id_value = getattr(item, self.id_column, None)
-                    print(f"ID для обновления: {id_value}, колонка: {self.id_column}")
-                    print(f"Атрибуты объекта AddressDTO: {item.__dict__}")
-                    
-                    if id_value is not None:
-                        try:
-                            # Преобразуем к числовым типам для безопасности
-                            update_data.append({
-                                'id': int(id_value) if isinstance(id_value, (int, float, str)) else id_value,
-                                'key': int(item.key) if isinstance(item.key, (int, float, str)) else item.key
-                            })
-                            print(f"Добавлены данные для обновления: ID={id_value}, key={item.key}")
-                        except (ValueError, TypeError) as e:
-                            print(f"Пропуск записи с невалидными данными: ID={id_value}, key={item.key}, ошибка: {str(e)}")
-                    else:
-                        print(f"ID не найден в объекте AddressDTO для ключа {item.key}")
-                elif item.key is not None:
-                    print(f"ID колонка не указана, но есть ключ: {item.key}")
-                elif self.id_column is not None:
-                    print(f"Ключ не определен для записи, id_column={self.id_column}")
-            
-            print(f"Подготовлено {len(output_data)} записей для выходной таблицы")
-            print(f"Подготовлено {len(update_data)} записей для обновления ключей во входной таблице")
-            
             # Загружаем метаданные
             print("\nЗагрузка метаданных...")
             metadata = MetaData(schema=self.schema)
             input_table_name = self.input_table_name
             
+            # Один список таблиц на оба этапа сохранения и на все последующие вызовы save()
+            if self._tables is None:
+                self._tables = inspect(self.engine).get_table_names(schema=self.schema)
+            tables = self._tables
+            
             # Создаем выходную таблицу
             print("Создание выходной таблицы...")
             output_table = Table(
@@ -316,31 +757,121 @@ class DatabaseOutputWorker(OutputWorker):
                 extend_existing=True
             )
             
-            # Создаем/сохраняем таблицу в БД
+            output_ready = True
             try:
-                output_table.create(self.engine, checkfirst=True)
+                if self.output_table_name not in tables:
+                    output_table.create(self.engine)
+                    tables.append(self.output_table_name)
                 print("Выходная таблица создана или уже существует")
-                
-                # Сохраняем данные в выходную таблицу
-                if output_data:
-                    with self.engine.begin() as conn:
-                        print(f"Сохранение {len(output_data)} записей в выходную таблицу...")
-                        conn.execute(output_table.insert(), output_data)
-                    print("Данные успешно сохранены в выходную таблицу")
             except Exception as e:
-                print(f"Ошибка при создании/сохранении выходной таблицы: {e}")
+                output_ready = False
+                print(f"Ошибка при создании выходной таблицы: {e}")
                 # Продолжаем выполнение для обновления ключей в любом случае
             
+            # ЭТАП 1: СОХРАНЕНИЕ ДАННЫХ В ВЫХОДНУЮ ТАБЛИЦУ
+            # ------------------------------------------
+            # Входной поток читается порциями по CHUNK_SIZE записей: каждая порция сразу записывается
+            # в выходную таблицу, а для обновления ключей запоминаются только пары ID - ключ.
+            # Повторяющиеся ID схлопываются (последний ключ побеждает): каждая запись обновляется один раз
+            update_map = {}
+            output_count = 0
+            
+            # Оператор вставки строится один раз: все порции выполняют один и тот же скомпилированный INSERT
+            insert_stmt = output_table.insert()
+            
+            # Порции записываются в фоновых потоках (write_workers), каждая своим соединением из пула
+            # и в своей транзакции: пока порция пишется в БД, текущий поток уже разбирает следующую.
+            # Ошибка записи порции прерывает сохранение: ключи не обновляются, а еще не начатые порции отменяются
+            background = self.background_write
+            write_workers = max(1, self.write_workers)
+            
+            print("Обработка входных данных...")
+            with contextlib.ExitStack() as stack:
+                if background:
+                    executor = stack.enter_context(ThreadPoolExecutor(max_workers=write_workers))
+                    pending = collections.deque()
+                    # Выполняется до ожидания потоков записи; при успешном сохранении очередь уже пуста
+                    stack.callback(lambda: [future.cancel() for future in pending])
+                else:
+                    conn = stack.enter_context(self.engine.begin())
+                
+                # Диагностика по каждой записи выводится только при уровне DEBUG; проверка уровня вынесена из цикла
+                debug = _log.isEnabledFor(logging.DEBUG)
+                id_column = self.id_column
+                skipped_count = 0
+                
+                for chunk in _chunked(addresses, self.CHUNK_SIZE):
+                    output_data = []
+                    for item in chunk:
+                        if debug:
+                            _log.debug("Обработка записи: raw=%s, key=%s", item.raw, item.key)
+                        
+                        # Данные для выходной таблицы: значения идут в порядке OUTPUT_COLUMNS
+                        output_data.append(item.to_row())
+                        
+                        # Данные для обновления входной таблицы
+                        key = item.key
+                        if key is not None and id_column is not None:
+                            id_value = getattr(item, id_column, None)
+                            
+                            if id_value is not None:
+                                try:
+                                    # Преобразуем к числовым типам для безопасности. ID и ключи почти всегда
+                                    # уже int: точная проверка типа обходит isinstance и вызов int()
+                                    id_val = id_value if type(id_value) is int else int(id_value) if isinstance(id_value, (int, float, str)) else id_value
+                                    update_map[id_val] = key if type(key) is int else int(key) if isinstance(key, (int, float, str)) else key
+                                    if debug:
+                                        _log.debug("Добавлены данные для обновления: ID=%s, key=%s", id_value, item.key)
+                                except (ValueError, TypeError) as e:
+                                    skipped_count += 1
+                                    if debug:
+                                        _log.debug("Пропуск записи с невалидными данными: ID=%s, key=%s, ошибка: %s", id_value, item.key, e)
+                            else:
+                                skipped_count += 1
+                                if debug:
+                                    _log.debug("ID не найден в объекте AddressDTO для ключа %s", item.key)
+                        elif debug and item.key is not None:
+                            _log.debug("ID колонка не указана, но есть ключ: %s", item.key)
+                        elif debug and id_column is not None:
+                            _log.debug("Ключ не определен для записи, id_column=%s", id_column)
+                    
+                    if not output_ready:
+                        continue
+                    
+                    if background:
+                        # Ожидают записи не больше двух порций на поток, чтобы память оставалась ограниченной
+                        if len(pending) >= 2 * write_workers:
+                            output_count += pending.popleft().result()
+                        pending.append(executor.submit(self._write_chunk, insert_stmt, output_data))
+                        continue
+                    
+                    # Порция записывается в общей транзакции в своей точке сохранения:
+                    # ошибка откатывает только эту порцию
+                    try:
+                        with conn.begin_nested():
+                            print(f"Сохранение {len(output_data)} записей в выходную таблицу...")
+                            self._insert_output(conn, insert_stmt, output_data)
+                        output_count += len(output_data)
+                    except Exception as e:
+                        print(f"Ошибка при сохранении порции в выходную таблицу: {e}")
+                
+                if background:
+                    while pending:
+                        output_count += pending.popleft().result()
+            
+            print(f"Сохранено {output_count} записей в выходную таблицу")
+            if skipped_count:
+                print(f"Пропущено записей без корректного ID для обновления ключей: {skipped_count}")
+            
+            print(f"Подготовлено {len(update_map)} записей для обновления ключей во входной таблице")
+            
             # ЭТАП 2: ОБНОВЛЕНИЕ КЛЮЧЕЙ ВО ВХОДНОЙ ТАБЛИЦЕ
             # ------------------------------------------
-            if update_data:
+            if update_map:
                 print("\n===== ЭТАП ОБНОВЛЕНИЯ КЛЮЧЕЙ =====")
                 
-                # Получаем информацию о структуре входной таблицы
-                inspector = inspect(self.engine)
                 try:
-                    # Проверяем существование таблицы
-                    tables = inspector.get_table_names(schema=self.schema)
+                    # Проверяем существование таблицы по уже полученному списку
                     print(f"Доступные таблицы: {tables}")
                     
                     # Проверяем регистр имени таблицы
@@ -357,33 +888,27 @@ class DatabaseOutputWorker(OutputWorker):
                     
                     input_table_name = actual_table_name
                     
-                    # Проверяем колонки таблицы
-                    columns = inspector.get_columns(input_table_name, schema=self.schema)
-                    print(f"Колонки входной таблицы:")
-                    column_names = []
-                    for col in columns:
-                        print(f"  - {col['name']} (тип: {col['type']})")
-                        column_names.append(col['name'])
+                    # Проверяем колонки таблицы (один раз за время жизни обработчика)
+                    col_map = self._input_columns
+                    if col_map is None:
+                        columns = inspect(self.engine).get_columns(input_table_name, schema=self.schema)
+                        print(f"Колонки входной таблицы:")
+                        col_map = self._input_columns = {}
+                        for col in columns:
+                            print(f"  - {col['name']} (тип: {col['type']})")
+                            col_map.setdefault(col['name'].lower(), col['name'])
                     
                     # Находим колонку ID с учетом регистра
-                    id_column_name = None
-                    for col_name in column_names:
-                        if col_name.lower() == self.id_column.lower():
-                            id_column_name = col_name
-                            print(f"Найдена ID колонка: {id_column_name}")
-                            break
-                    
+                    id_column_name = col_map.get(self.id_column.lower())
                     if not id_column_name:
                         print(f"ОШИБКА: Колонка {self.id_column} не найдена в таблице!")
                         return
+                    print(f"Найдена ID колонка: {id_column_name}")
                     
                     # Проверяем существование колонки для ключей
-                    key_column_name = None
-                    for col_name in column_names:
-                        if col_name.lower() == 'key_street_house':
-                            key_column_name = col_name
-                            print(f"Найдена колонка ключей: {key_column_name}")
-                            break
+                    key_column_name = col_map.get('key_street_house')
+                    if key_column_name:
+                        print(f"Найдена колонка ключей: {key_column_name}")
                     
                     # Если колонки нет, создаем ее
                     if not key_column_name:
@@ -395,104 +920,35 @@ class DatabaseOutputWorker(OutputWorker):
                                 conn.execute(text(sql))
                             print("Колонка key_street_house успешно создана")
                             key_column_name = "key_street_house"
+                            col_map[key_column_name] = key_column_name
                         except Exception as e:
                             print(f"Ошибка при создании колонки: {e}")
                             return
                     
+                    # Каждая партия ищет записи по ID - без индекса это полный просмотр таблицы на партию
+                    if self.engine.dialect.name == 'postgresql':
+                        _ensure_index(self.engine, self.schema, input_table_name, id_column_name)
+                    
                     # ПРЯМОЕ ОБНОВЛЕНИЕ С ЯВНЫМ УКАЗАНИЕМ СХЕМЫ И ИМЕН КОЛОНОК
                     print("\nНачинаем обновление ключей...")
                     
-                    # Используем прямое подключение
-                    conn = self.engine.raw_connection()
-                    cursor = conn.cursor()
+                    print(f"Всего записей для обновления: {len(update_map)}")
                     
-                    # Проверка текущих значений
-                    sql_check = f'SELECT COUNT(*) FROM "{self.schema}"."{input_table_name}" WHERE "{key_column_name}" IS NOT NULL'
-                    cursor.execute(sql_check)
-                    non_null_count = cursor.fetchone()[0]
-                    print(f"Текущее количество записей с непустыми ключами: {non_null_count}")
-                    
-                    # Обновляем записи партиями
-                    success_count = 0
-                    error_count = 0
-                    batch_size = 50
-                    current_batch = []
-                    
-                    print(f"Всего записей для обновления: {len(update_data)}")
-                    
-                    for i, update in enumerate(update_data):
-                        id_val = update['id']
-                        key_val = update['key']
-                        
-                        # Добавляем в текущую партию
-                        current_batch.append((key_val, id_val))
-                        
-                        # Когда партия заполнена или это последняя запись
-                        if len(current_batch) >= batch_size or i == len(update_data) - 1:
-                            try:
-                                # Создаем временную таблицу для пакетного обновления
-                                cursor.execute('DROP TABLE IF EXISTS temp_key_updates')
-                                cursor.execute('CREATE TEMP TABLE temp_key_updates (key_val INTEGER, id_val INTEGER)')
-                                
-                                # Вставляем данные во временную таблицу
-                                for key_val, id_val in current_batch:
-                                    cursor.execute('INSERT INTO temp_key_updates VALUES (%s, %s)', (key_val, id_val))
-                                
-                                # Выполняем обновление через JOIN
-                                sql_update = f'''
-                                UPDATE "{self.schema}"."{input_table_name}" AS t
-                                SET "{key_column_name}" = k.key_val
-                                FROM temp_key_updates AS k
-                                WHERE t."{id_column_name}" = k.id_val
-                                '''
-                                
-                                cursor.execute(sql_update)
-                                affected = cursor.rowcount
-                                
-                                # Подтверждаем изменения
-                                conn.commit()
-                                
-                                success_count += affected
-                                print(f"Пакетное обновление: {affected} записей обновлено из {len(current_batch)}")
-                                
-                                # Очищаем партию
-                                current_batch = []
-                            except Exception as e:
-                                error_count += len(current_batch)
-                                print(f"Ошибка пакетного обновления: {e}")
-                                conn.rollback()
-                                
-                                # Попробуем обновить по одной записи
-                                print("Пробуем обновлять записи по одной...")
-                                for key_val, id_val in current_batch:
-                                    try:
-                                        sql = f'UPDATE "{self.schema}"."{input_table_name}" SET "{key_column_name}" = %s WHERE "{id_column_name}" = %s'
-                                        cursor.execute(sql, (key_val, id_val))
-                                        if cursor.rowcount > 0:
-                                            success_count += 1
-                                        conn.commit()
-                                    except Exception as e2:
-                                        error_count += 1
-                                        conn.rollback()
-                                        print(f"Ошибка индивидуального обновления для ID={id_val}: {e2}")
-                                
-                                # Очищаем партию
-                                current_batch = []
+                    # psycopg2 обновляет партию одним запросом со списком VALUES, остальные драйверы - пакетным executemany
+                    if self.engine.dialect.driver == 'psycopg2':
+                        success_count, error_count = self._update_keys_values(input_table_name, key_column_name, id_column_name, update_map)
+                    else:
+                        success_count, error_count = self._update_keys_executemany(input_table_name, key_column_name, id_column_name, update_map)
                     
-                    # Проверяем результаты
-                    cursor.execute(sql_check)
-                    new_non_null_count = cursor.fetchone()[0]
+                    # Результаты считаем по rowcount пакетных UPDATE, без повторного COUNT(*)
                     print(f"\nРезультаты обновления:")
-                    print(f"Было записей с ключами до обновления: {non_null_count}")
-                    print(f"Стало записей с ключами после обновления: {new_non_null_count}")
-                    print(f"Добавлено новых записей с ключами: {new_non_null_count - non_null_count}")
                     print(f"Успешно обновлено: {success_count}, Ошибок: {error_count}")
                     
                     # Показываем примеры обновленных записей
                     try:
                         sql_examples = f'SELECT "{id_column_name}", "{key_column_name}" FROM "{self.schema}"."{input_table_name}" WHERE "{key_column_name}" IS NOT NULL LIMIT 5'
-                        cursor.execute(sql_examples)
-                        examples = cursor.fetchall()
+                        with self.engine.connect() as conn:
+                            examples = conn.exec_driver_sql(sql_examples).all()
                         
                         if examples:
                             print("\nПримеры обновленных записей:")
@@ -501,51 +957,13 @@ class DatabaseOutputWorker(OutputWorker):
                     except Exception as e:
                         print(f"Ошибка при получении примеров: {e}")
                     
-                    # Закрываем курсор и соединение
-                    cursor.close()
-                    conn.close()
-                    
-                    # Если ничего не обновилось, проведем дополнительную диагностику
-                    if new_non_null_count == non_null_count:
-                        print("\nВНИМАНИЕ! Обновление не повлияло на количество записей с ключами")
+                    # Если ничего не обновилось, выводим возможные причины
+                    if success_count == 0:
+                        print("\nВНИМАНИЕ! Обновление не затронуло ни одной записи")
                         print("Возможные причины:")
                         print("1. Записи с указанными ID не существуют в таблице")
                         print("2. У записей уже были установлены ключи")
                         print("3. Проблемы с правами доступа или триггерами")
-                        
-                        # Попробуем крайний способ - прямое обновление одной записи
-                        if len(update_data) > 0:
-                            try:
-                                test_id = update_data[0]['id']
-                                test_key = 999999
-                                
-                                print(f"\nПроводим тестовое обновление для ID={test_id}, Key={test_key}...")
-                                
-                                with self.engine.begin() as conn:
-                                    # Максимально простой запрос обновления
-                                    sql = text(f'UPDATE "{self.schema}"."{input_table_name}" SET "{key_column_name}" = :key WHERE "{id_column_name}" = :id')
-                                    conn.execute(sql, {"key": test_key, "id": test_id})
-                                    
-                                    # Проверяем результат
-                                    check = text(f'SELECT COUNT(*) FROM "{self.schema}"."{input_table_name}" WHERE "{id_column_name}" = :id AND "{key_column_name}" = :key')
-                                    result = conn.execute(check, {"id": test_id, "key": test_key}).scalar()
-                                    
-                                    if result > 0:
-                                        print(f"ТЕСТ УСПЕШЕН: Запись с ID={test_id} обновлена до Key={test_key}")
-                                        print("Если вы видите это сообщение, то проблема может быть в механизме обновления.")
-                                    else:
-                                        print(f"ТЕСТ ПРОВАЛЕН: Запись с ID={test_id} не была обновлена")
-                                        
-                                        # Проверяем существование записи
-                                        exists = text(f'SELECT COUNT(*) FROM "{self.schema}"."{input_table_name}" WHERE "{id_column_name}" = :id')
-                                        count = conn.execute(exists, {"id": test_id}).scalar()
-                                        
-                                        if count == 0:
-                                            print(f"ПРИЧИНА: Запись с ID={test_id} не существует в таблице")
-                                        else:
-                                            print(f"ПРИЧИНА: Запись существует, но не может быть обновлена")
-                            except Exception as e:
-                                print(f"Ошибка при тестовом обновлении: {e}")
                 
                 except Exception as e:
                     print(f"Ошибка при анализе структуры БД: {e}")
@@ -556,123 +974,145 @@ class DatabaseOutputWorker(OutputWorker):
             self.logger.write(f"Ошибка при сохранении результатов: {str(e)}\n")
             raise e
 
-    def _expand_address_with_rules(self, address: str) -> str:
-        """Расширяет адрес с помощью правил."""
-        print("\n" + "="*50)
-        print("РАСШИРЕНИЕ АДРЕСА С ПОМОЩЬЮ ПРАВИЛ")
-        print(f"Исходный адрес: {address}")
-        print("="*50 + "\n")
-
-        # Приводим к верхнему регистру
-        address = address.upper()
-        print("После приведения к верхнему регистру:")
-        print(f"  - Адрес: {address}")
-
-        # Заменяем сокращения
-        for old, new in self.replacements.items():
-            if old in address:
-                print(f"  - Замена '{old}' на '{new}'")
-                address = address.replace(old, new)
-
-        print("После замены сокращений:")
-        print(f"  - Адрес: {address}\n")
-
-        # Разбиваем адрес на части
-        parts = address.split()
-        print("Части адреса:")
-        print(f"  - {parts}\n")
-
-        # Извлекаем номер дома
-        house_number = None
-        for i, part in enumerate(parts):
-            if part.replace('/', '').replace('К', '').replace('СТР.', '').replace('С', '').replace('А', '').replace('Б', '').replace('В', '').replace('Г', '').replace('Д', '').replace('Е', '').replace('Ж', '').replace('З', '').replace('И', '').replace('К', '').replace('Л', '').replace('М', '').replace('Н', '').replace('О', '').replace('П', '').replace('Р', '').replace('С', '').replace('Т', '').replace('У', '').replace('Ф', '').replace('Х', '').replace('Ц', '').replace('Ч', '').replace('Ш', '').replace('Щ', '').replace('Ъ', '').replace('Ы', '').replace('Ь', '').replace('Э', '').replace('Ю', '').replace('Я', '').isdigit():
-                house_number = part
-                parts.pop(i)
-                break
+    def _update_keys_values(self, table_name: str, key_column: str, id_column: str, update_map: dict) -> tuple[int, int]:
+        """Обновляет ключи во входной таблице PostgreSQL (psycopg2) запросами UPDATE ... FROM (VALUES ...).
 
-        if house_number:
-            print(f"Номер дома: {house_number}")
-            print("Адрес без номера дома:")
-            print(f"  - {' '.join(parts)}\n")
-
-        # Проверяем префиксы территории
-        print("Проверка префиксов территории:")
-        print(f"  - Доступные префиксы: {list(self.territory_prefixes.keys())}")
-        print(f"  - Текущий адрес: '{' '.join(parts)}'")
-
-        is_territory = False
-        for prefix in self.territory_prefixes:
-            if parts and parts[0] == prefix:
-                is_territory = True
-                print(f"  - Найден префикс территории: True\n")
-                print("Обнаружен префикс территории:")
-                print(f"  - Префикс: {prefix}")
-                parts.pop(0)  # Удаляем префикс
-                print(f"  - Адрес без префикса: {' '.join(parts)}\n")
-                break
-        else:
-            print(f"  - Найден префикс территории: False\n")
+        Args:
+            table_name (str): Имя входной таблицы.
+            key_column (str): Имя колонки для ключей.
+            id_column (str): Имя ID-колонки.
+            update_map (dict): Ключи записей по их ID.
 
-        # Применяем специальные правила
-        print("Применение специальных правил:")
-        expanded_parts = []
-        processed_indices = set()  # Множество для отслеживания обработанных индексов
-        
-        # Сначала проверяем все возможные составные слова
-        i = 0
-        while i < len(parts):
-            if i in processed_indices:
-                i += 1
-                continue
-                
-            # Проверяем составные слова разной длины
-            found_compound = False
-            for length in range(min(3, len(parts) - i), 0, -1):  # Проверяем последовательности от 3 до 1 слова
-                compound_word = ' '.join(parts[i:i+length])
-                if compound_word in self.special_rules:
-                    print(f"  - Найдено составное слово: '{compound_word}'")
-                    expanded = self.special_rules[compound_word]
-                    print(f"    - Применяем правило: '{expanded}'")
-                    expanded_parts.append(expanded)
-                    # Отмечаем все слова из составного как обработанные
-                    for j in range(i, i + length):
-                        processed_indices.add(j)
-                    i += length  # Пропускаем все слова из составного
-                    found_compound = True
-                    break
-            
-            if not found_compound:
-                # Если составное слово не найдено, проверяем одиночное слово
-                part = parts[i]
-                print(f"  - Проверка слова: '{part}'")
-                if part in self.special_rules:
-                    expanded = self.special_rules[part]
-                    print(f"    - Найдено правило для слова '{part}': '{expanded}'")
-                    # Проверяем, не содержится ли уже это слово в предыдущих частях
-                    if not any(expanded in prev for prev in expanded_parts):
-                        expanded_parts.append(expanded)
-                    else:
-                        print(f"    - Слово '{expanded}' уже присутствует в адресе, пропускаем")
-                        expanded_parts.append(part)
-                else:
-                    print(f"    - Правило не найдено для слова '{part}', оставляем как есть")
-                    expanded_parts.append(part)
-                processed_indices.add(i)
-                i += 1
-
-        # Если это территория, добавляем префикс обратно
-        if is_territory:
-            print("\nДобавлен префикс территории обратно:")
-            print(f"  - Адрес с префиксом: {list(self.territory_prefixes.keys())[0]} {' '.join(expanded_parts)}")
-            expanded_parts.insert(0, list(self.territory_prefixes.keys())[0])
-
-        # Собираем адрес обратно
-        result = ' '.join(expanded_parts)
-        if house_number:
-            result += f" {house_number}"
-
-        print("\nИтоговый расширенный адрес:")
-        print(f"  - {result}")
-        print("="*50 + "\n")
-
-        return result
\ No newline at end of file
+        Returns:
+            tuple[int, int]: Количество обновленных записей и количество записей в партиях, завершившихся ошибкой.
+        """
+        from psycopg2.extras import execute_values
+
+        # Используем прямое подключение
+        conn = self.engine.raw_connection()
+        cursor = conn.cursor()
+
+        # Подсчет требует полного прохода по входной таблице, поэтому только для отладки
+        if _log.isEnabledFor(logging.DEBUG):
+            cursor.execute(f'SELECT COUNT(*) FROM "{self.schema}"."{table_name}" WHERE "{key_column}" IS NOT NULL')
+            _log.debug("Текущее количество записей с непустыми ключами: %s", cursor.fetchone()[0])
+
+        # Запросы обновления зависят только от имен таблицы и колонок - формируем их один раз.
+        # Партия передается прямо в запрос списком VALUES: без временной таблицы и ее заполнения
+        sql_update = f'''
+                    UPDATE "{self.schema}"."{table_name}" AS t
+                    SET "{key_column}" = k.key_val
+                    FROM (VALUES %s) AS k (key_val, id_val)
+                    WHERE t."{id_column}" = k.id_val
+                    '''
+
+        # Ключи можно пересчитать повторным запуском, поэтому фиксация не ждет записи WAL на диск
+        cursor.execute('SET LOCAL synchronous_commit = off')
+
+        # Обновляем записи партиями в одной транзакции с одной фиксацией в конце. Каждая партия
+        # выполняется в своей точке сохранения: ошибка откатывает только ее, а остальные партии
+        # продолжают обновляться. Построчного повтора нет - он выполнял бы по запросу на запись
+        success_count = 0
+        error_count = 0
+
+        try:
+            # Партии берутся прямо из словаря ID -> ключ, без промежуточного списка записей
+            pairs = ((key_val, id_val) for id_val, key_val in update_map.items())
+            for current_batch in _chunked(pairs, self.batch_size):
+                try:
+                    cursor.execute('SAVEPOINT key_batch')
+
+                    # Вся партия обновляется одним UPDATE ... FROM (VALUES ...):
+                    # размер страницы не меньше партии, поэтому rowcount относится ко всей партии
+                    execute_values(cursor, sql_update, current_batch, page_size=len(current_batch))
+                    affected = cursor.rowcount
+                    cursor.execute('RELEASE SAVEPOINT key_batch')
+
+                    success_count += affected
+                    print(f"Пакетное обновление: {affected} записей обновлено из {len(current_batch)}")
+
+                except Exception as e:
+                    error_count += len(current_batch)
+                    print(f"Ошибка пакетного обновления, партия из {len(current_batch)} записей пропущена: {e}")
+                    cursor.execute('ROLLBACK TO SAVEPOINT key_batch')
+
+            # Подтверждаем все изменения одной фиксацией
+            conn.commit()
+        except Exception:
+            # Незафиксированные изменения откатываются, соединение возвращается в пул чистым
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+        return success_count, error_count
+
+    def _update_keys_executemany(self, table_name: str, key_column: str, id_column: str, update_map: dict) -> tuple[int, int]:
+        """Обновляет ключи во входной таблице для драйверов, отличных от psycopg2.
+
+        Каждая партия передается одним executemany: драйвер выполняет ее пакетом (fast_executemany
+        для pyodbc), а не отдельным запросом на запись. Как и для PostgreSQL, партия выполняется
+        в своей точке сохранения внутри общей транзакции.
+
+        Args:
+            table_name (str): Имя входной таблицы.
+            key_column (str): Имя колонки для ключей.
+            id_column (str): Имя ID-колонки.
+            update_map (dict): Ключи записей по их ID.
+
+        Returns:
+            tuple[int, int]: Количество обновленных записей и количество записей в партиях, завершившихся ошибкой.
+        """
+        sql_update = text(f'UPDATE "{self.schema}"."{table_name}" SET "{key_column}" = :key_val WHERE "{id_column}" = :id_val')
+        success_count = 0
+        error_count = 0
+
+        with self.engine.begin() as conn:
+            pairs = ({'key_val': key_val, 'id_val': id_val} for id_val, key_val in update_map.items())
+            for current_batch in _chunked(pairs, self.batch_size):
+                try:
+                    with conn.begin_nested():
+                        affected = conn.execute(sql_update, current_batch).rowcount
+                    # Не все драйверы сообщают rowcount для executemany (-1)
+                    affected = affected if affected >= 0 else len(current_batch)
+                    success_count += affected
+                    print(f"Пакетное обновление: {affected} записей обновлено из {len(current_batch)}")
+                except Exception as e:
+                    error_count += len(current_batch)
+                    print(f"Ошибка пакетного обновления, партия из {len(current_batch)} записей пропущена: {e}")
+
+        return success_count, error_count
+
+    def _write_chunk(self, insert_stmt, output_data: list[tuple]) -> int:
+        """Записывает порцию строк в выходную таблицу в отдельной транзакции. Выполняется в потоке записи.
+        Ошибка не перехватывается: она передается через результат задачи и прерывает сохранение.
+
+        Args:
+            insert_stmt: Оператор INSERT выходной таблицы.
+            output_data (list[tuple]): Строки со значениями колонок OUTPUT_COLUMNS.
+
+        Returns:
+            int: Количество записанных строк.
+        """
+        with self.engine.begin() as conn:
+            print(f"Сохранение {len(output_data)} записей в выходную таблицу...")
+            self._insert_output(conn, insert_stmt, output_data)
+        return len(output_data)
+
+    def _insert_output(self, conn, insert_stmt, output_data: list[tuple]):
+        """Вставляет порцию строк в выходную таблицу. Для PostgreSQL данные загружаются через COPY,
+        для остальных СУБД - executemany (для MSSQL движок создается с fast_executemany).
+
+        Args:
+            conn: Соединение SQLAlchemy, внутри транзакции которого выполняется вставка.
+            insert_stmt: Оператор INSERT выходной таблицы.
+            output_data (list[tuple]): Строки со значениями колонок OUTPUT_COLUMNS.
+        """
+
+        if self.engine.dialect.name == 'postgresql':
+            column_list = ', '.join(f'"{name}"' for name in self.OUTPUT_COLUMNS)
+            sql = f'COPY "{self.schema}"."{self.output_table_name}" ({column_list}) FROM STDIN'
+            _copy_rows(conn, sql, output_data)
+        else:
+            conn.execute(insert_stmt, [dict(zip(self.OUTPUT_COLUMNS, row)) for row in output_data])
@@ -10,12 +10,37 @@
 
 __all__ = ['Tokenizer', 'Parser']
 
+import threading
+
 import yargy
 import yargy.tokenizer
+from yargy.morph import CachedMorphAnalyzer
 from .tokenizer_rules import TOKENIZER_RULES, MorphTokenizer
 from .address_rules import ADDRESS
 
 
+_morph = None
+_morph_lock = threading.Lock()
+
+
+def _shared_morph() -> CachedMorphAnalyzer:
+    """Возвращает общий для всех токенизаторов морфологический анализатор.
+
+    Загрузка словарей pymorphy2 занимает заметное время и память, а кэш разборов CachedMorphAnalyzer
+    ограничен по размеру и общий для всех его экземпляров (ключ включает экземпляр), поэтому
+    отдельные анализаторы у парсера адресов и парсера типов улиц только вытесняют записи друг друга.
+
+    Returns:
+        CachedMorphAnalyzer: Морфологический анализатор.
+    """
+
+    global _morph
+    with _morph_lock:
+        if _morph is None:
+            _morph = CachedMorphAnalyzer()
+        return _morph
+
+
 def Tokenizer(rules: list[yargy.tokenizer.TokenRule]=TOKENIZER_RULES) -> MorphTokenizer:
     """Создает экземпляр токенайзера под нашу грамматику
 
@@ -26,7 +51,7 @@ def Tokenizer(rules: list[yargy.tokenizer.TokenRule]=TOKENIZER_RULES) -> MorphTo
         MorphTokenizer: Готовый к использованию токенизатор.
     """
 
-    return MorphTokenizer(rules)
+    return MorphTokenizer(rules, morph=_shared_morph())
 
 
 def Parser(address_rules: yargy.api.Rule = None, tokenizer: MorphTokenizer = None) -> yargy.Parser:
@@ -17,6 +17,7 @@ from yargy.predicates import (
 )
 
 from yargy.pipelines import caseless_pipeline
+from yargy.predicates.constructors import OrPredicate
 
 
 AddressFact = fact(
@@ -211,9 +212,45 @@ TERRITORY_PREFIX = dictionary({
     "тер.", "территория", "территор", "тер"
 })
 
+def _merge_keyword_predicates(*predicates) -> OrPredicate:
+    """Сводит альтернативы из предикатов normalized, caseless и in_caseless к двум предикатам:
+    dictionary по всем нормальным формам и in_caseless по всем написаниям.
+
+    yargy проверяет альтернативы or_ по очереди, поэтому токен, не являющийся ключевым словом,
+    проходил все предикаты. После объединения проверка - два поиска в множествах.
+    Множества собираются из самих предикатов, поэтому остаются согласованными с правилами типов улиц.
+
+    Args:
+        *predicates: Предикаты (в том числе or_ из них).
+
+    Raises:
+        TypeError: Предикат не поддерживается.
+
+    Returns:
+        OrPredicate: Эквивалентный объединенный предикат.
+    """
+
+    words = set()
+    forms = set()
+    stack = list(predicates)
+    while stack:
+        predicate = stack.pop()
+        if isinstance(predicate, OrPredicate):
+            stack.extend(predicate.predicates)
+        elif isinstance(predicate, normalized):
+            words.add(predicate.value)
+        elif isinstance(predicate, in_caseless):
+            forms.update(predicate.value)
+        elif isinstance(predicate, caseless):
+            forms.add(predicate.value)
+        else:
+            raise TypeError(f"Неподдерживаемый предикат: {predicate}")
+    return or_(dictionary(words), in_caseless(forms))
+
+
 # Предикат. Не является каким то ключевым словом (типом улицы, др вспомогательным словом)
 NOT_STREET_TYPE_OR_OTHER_KEYWORD = not_(
-    or_(
+    _merge_keyword_predicates(
         ULITSA_PREDICATE,
         SHOSSE_PREDICATE,
         BULVAR_PREDICATE,
@@ -1,15 +1,18 @@
 from yargy.tokenizer import MorphTokenizer, TokenRule
 
 
+# yargy объединяет правила в одно регулярное выражение (одна альтернатива на правило) и компилирует его
+# с флагом IGNORECASE, поэтому класс [а-яё] покрывает и заглавные буквы. Простые классы символов
+# без групп сканируются заметно быстрее альтернатив вида ([а-яё]|[А-ЯЁ])+, которые re перебирает посимвольно
 TOKENIZER_RULES = [
     # 1-ая 50-летия
-    TokenRule("AlphaNumericWord", r'(\d{1,3}-([а-яё]|[А-ЯЁ])+)'),
+    TokenRule("AlphaNumericWord", r'\d{1,3}-[а-яё]+'),
 
     # пр-кт л-н б-р
-    TokenRule("DashedWord", r'([а-яё]|[А-ЯЁ])+-([а-яё]|[А-ЯЁ])+'),
+    TokenRule("DashedWord", r'[а-яё]+-[а-яё]+'),
 
     # Обычые слова
-    TokenRule("RU", r'([а-яё]|[А-ЯЁ])+'),
+    TokenRule("RU", r'[а-яё]+'),
 
     # Числа
     TokenRule("INT", r'\d+'),
@@ -24,9 +24,11 @@ ULITSA_PREDICATE = or_(normalized("улица"), in_caseless({"ул", "у"}))
 SHOSSE_PREDICATE = or_(normalized("шоссе"), caseless("ш"))
 BULVAR_PREDICATE = or_(normalized("бульвар"), in_caseless({"б-р", "бр", "б"}))
 LINIYA_PREDICATE = or_(normalized("линия"), in_caseless({"л-н", "лн", "л"}))
-PEREULOK_PREDICATE = or_(normalized("переулок"), in_caseless({"пер", "пр"}))
+# Сокращение "пр" относится только к проспекту: в адресе оно и раньше разбиралось как проспект (PROSPECT
+# стоит в TYPE раньше), а лишние альтернативы для переулка и проезда только множили варианты разбора
+PEREULOK_PREDICATE = or_(normalized("переулок"), in_caseless({"пер"}))
 PROSPECT_PREDICATE = or_(normalized("проспект"), in_caseless({"пр-кт", "пр", "пркт"}))
-PROEZD_PREDICATE = or_(normalized("проезд"), in_caseless({"пр-д", "прд", "пр"}))
+PROEZD_PREDICATE = or_(normalized("проезд"), in_caseless({"пр-д", "прд"}))
 PLOSHAD_PREDICATE = or_(normalized("площадь"), in_caseless({"плщ", "пл"}))
 TERRITORIA_PREDICATE = or_(normalized("территория"), caseless("тер"))
 
@@ -1,44 +1,52 @@
+from functools import lru_cache
+import logging
 import os
+import re
+
 import pandas as pd
 
+_log = logging.getLogger(__name__)
+
+
 class ExceptionsManager:
     """Менеджер для работы с исключениями адресов."""
     
+    # Различные варианты написания и их стандартная форма
+    REPLACEMENTS = {
+        'УЛИЦА': 'УЛ.',
+        'УЛ ': 'УЛ.',
+        'УЛ.': 'УЛ.',
+        'ПРОСПЕКТ': 'ПР-КТ',
+        'ПРОСП': 'ПР-КТ',
+        'ПР-Т': 'ПР-КТ',
+        'ПРОЕЗД': 'ПР-Д',
+        'ПР.': 'ПР-Д',
+        'БУЛЬВАР': 'Б-Р',
+        'БУЛ': 'Б-Р',
+        'ПЛОЩАДЬ': 'ПЛ.',
+        'ПЛ ': 'ПЛ.',
+    }
+    # Все замены выполняются за один проход; более длинные варианты проверяются первыми
+    _REPLACEMENTS_RE = re.compile('|'.join(map(re.escape, sorted(REPLACEMENTS, key=len, reverse=True))))
+
     def __init__(self, exceptions_file="Exceptions.xlsx"):
         self.exceptions_file = exceptions_file
         self.exceptions = {}  # {неправильный_адрес: (правильный_адрес, ключ)}
         self._load_exceptions()
         
-    def _normalize_address(self, address: str) -> str:
-        """Нормализует адрес для сравнения."""
+    @classmethod
+    @lru_cache(maxsize=131072)
+    def _normalize_address(cls, address: str) -> str:
+        """Нормализует адрес для сравнения. Результат кэшируется."""
         if not address:
             return ""
-        print(f"Нормализация адреса: {address}")  # Отладочная информация
         # Приводим к верхнему регистру
         address = address.upper()
-        print(f"После приведения к верхнему регистру: {address}")  # Отладочная информация
         # Заменяем различные варианты написания на стандартные
-        replacements = {
-            'УЛИЦА': 'УЛ.',
-            'УЛ ': 'УЛ.',
-            'УЛ.': 'УЛ.',
-            'ПРОСПЕКТ': 'ПР-КТ',
-            'ПРОСП': 'ПР-КТ',
-            'ПР-Т': 'ПР-КТ',
-            'ПРОЕЗД': 'ПР-Д',
-            'ПР.': 'ПР-Д',
-            'БУЛЬВАР': 'Б-Р',
-            'БУЛ': 'Б-Р',
-            'ПЛОЩАДЬ': 'ПЛ.',
-            'ПЛ ': 'ПЛ.',
-        }
-        for old, new in replacements.items():
-            if old in address:
-                print(f"Замена '{old}' на '{new}'")  # Отладочная информация
-                address = address.replace(old, new)
+        address = cls._REPLACEMENTS_RE.sub(lambda match: cls.REPLACEMENTS[match.group(0)], address)
         # Убираем лишние пробелы
         address = ' '.join(address.split())
-        print(f"Итоговый нормализованный адрес: {address}")  # Отладочная информация
+        _log.debug("Нормализованный адрес: %s", address)
         return address
         
     def _load_exceptions(self):
@@ -49,13 +57,17 @@ class ExceptionsManager:
                 df = pd.read_excel(self.exceptions_file)
                 print(f"Содержимое файла исключений:\n{df}")
                 
-                # Загружаем данные в словарь с нормализацией адресов
-                self.exceptions = {}
-                for _, row in df.iterrows():
-                    address = self._normalize_address(row['address'])
-                    correct_address = row['correct_address']
-                    key = row['key']
-                    self.exceptions[address] = (correct_address, key)
+                # Строки без адреса пропускаются: иначе пустой адрес стал бы ключом исключения,
+                # и его получали бы все записи с пустым адресом
+                df = df.dropna(subset=['address'])
+                
+                # Загружаем данные в словарь с нормализацией адресов (нормализация по всей колонке сразу)
+                addresses = normalize_series(df['address'])
+                self.exceptions = {
+                    address: (correct_address, key)
+                    for address, correct_address, key in zip(addresses, df['correct_address'], df['key'])
+                    if address
+                }
                 
                 print(f"Загруженные исключения: {self.exceptions}")
             else:
@@ -65,18 +77,16 @@ class ExceptionsManager:
             
     def get_key(self, address: str) -> tuple[int | None, str]:
         """Получает ключ для адреса из исключений."""
-        print(f"\nПоиск ключа для адреса: {address}")  # Отладочная информация
+        _log.debug("Поиск ключа для адреса: %s", address)
         normalized_address = self._normalize_address(address)
-        print(f"Нормализованный адрес для поиска: {normalized_address}")  # Отладочная информация
-        print(f"Доступные исключения: {self.exceptions}")  # Отладочная информация
         
         if normalized_address in self.exceptions:
             correct_address, key = self.exceptions[normalized_address]
-            print(f"Адрес найден в исключениях: correct_address={correct_address}, key={key}")  # Отладочная информация
+            _log.debug("Адрес найден в исключениях: correct_address=%s, key=%s", correct_address, key)
             if key is None:
                 return None, "адрес не существует"
             return key, ""
-        print(f"Адрес не найден в исключениях")  # Отладочная информация
+        _log.debug("Адрес не найден в исключениях")
         return None, "адрес не найден"
         
     def get_correct_address(self, address: str) -> str | None:
@@ -85,4 +95,25 @@ class ExceptionsManager:
         if normalized_address in self.exceptions:
             correct_address, _ = self.exceptions[normalized_address]
             return correct_address
-        return None 
\ No newline at end of file
+        return None
+
+
+def normalize_series(addresses: pd.Series) -> pd.Series:
+    """Нормализует колонку адресов так же, как ExceptionsManager._normalize_address,
+    но строковыми операциями pandas по всей колонке сразу.
+
+    Args:
+        addresses (pd.Series): Исходные адреса (без пропущенных значений).
+
+    Returns:
+        pd.Series: Нормализованные адреса.
+    """
+
+    addresses = addresses.astype(str).str.upper()
+    addresses = addresses.str.replace(
+        ExceptionsManager._REPLACEMENTS_RE,
+        lambda match: ExceptionsManager.REPLACEMENTS[match.group(0)],
+        regex=True,
+    )
+    # Убираем лишние пробелы
+    return addresses.str.split().str.join(' ')
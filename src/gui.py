@@ -14,7 +14,7 @@ from tkinter import filedialog
 import re
 from tkinter.ttk import Combobox
 
-from .OutputWorker.outputWorker import GUILogger, LoggersCollection
+from .OutputWorker.outputWorker import BufferedLogger, GUILogger, LoggersCollection
 from main import process_excel, process_db
 from .OutputWorker.outputWorker import LoggersCollection as logger
 import time
@@ -231,6 +231,7 @@ class ProcessFrame(Frame):
             error_message = str(error)
             self.after(0, lambda: messagebox.showerror("Ошибка!", error_message))
         finally:
+            self.logger.flush()
             self.after(0, lambda: self._cleanup_processing())
 
     def _cleanup_processing(self):
@@ -836,17 +837,19 @@ class DataBaseFrame(ProcessFrame):
             
         return True
 
-class TextLogger:
+class TextLogger(BufferedLogger):
     def __init__(self, text_widget):
+        super().__init__()
         self.text_widget = text_widget
         
-    def write(self, text):
-        self.text_widget.insert(END, text)
+    def _tk_widget(self):
+        return self.text_widget
+
+    def _emit(self, messages):
+        # Пакет сообщений выводится одной вставкой и одним обновлением виджета
+        self.text_widget.insert(END, ''.join(messages))
         self.text_widget.see(END)
         self.text_widget.update_idletasks()
-        
-    def flush(self):
-        pass
 
 class ExceptionsFrame(Frame):
     """Фрейм для работы с файлом исключений адресов."""
@@ -1081,112 +1084,6 @@ class ExceptionDialog(Toplevel):
         """Обработчик нажатия кнопки Отмена."""
         self.destroy()
 
-class ExceptionsManager:
-    """Менеджер для работы с исключениями адресов."""
-    
-    def __init__(self, exceptions_file="Exceptions.xlsx"):
-        self.exceptions_file = exceptions_file
-        self.exceptions = {}  # {неправильный_адрес: (правильный_адрес, ключ)}
-        self._load_exceptions()
-        
-    def _normalize_address(self, address: str) -> str:
-        """Нормализует адрес для сравнения.
-        
-        Args:
-            address (str): Исходный адрес.
-            
-        Returns:
-            str: Нормализованный адрес.
-        """
-        if not address:
-            return ""
-        # Приводим к верхнему регистру
-        address = address.upper()
-        # Заменяем различные варианты написания на стандартные
-        replacements = {
-            'УЛИЦА': 'УЛ.',
-            'УЛ ': 'УЛ.',
-            'УЛ.': 'УЛ.',
-            'ПРОСПЕКТ': 'ПР-КТ',
-            'ПРОСП': 'ПР-КТ',
-            'ПР-Т': 'ПР-КТ',
-            'ПРОЕЗД': 'ПР-Д',
-            'ПР.': 'ПР-Д',
-            'БУЛЬВАР': 'Б-Р',
-            'БУЛ': 'Б-Р',
-            'ПЛОЩАДЬ': 'ПЛ.',
-            'ПЛ ': 'ПЛ.',
-        }
-        for old, new in replacements.items():
-            address = address.replace(old, new)
-        # Убираем лишние пробелы
-        address = ' '.join(address.split())
-        return address
-        
-    def _load_exceptions(self):
-        """Загружает исключения из файла."""
-        try:
-            if os.path.exists(self.exceptions_file):
-                print(f"Загрузка исключений из файла: {self.exceptions_file}")
-                df = pd.read_excel(self.exceptions_file)
-                print(f"Содержимое файла исключений:\n{df}")
-                
-                # Загружаем данные в словарь с нормализацией адресов
-                self.exceptions = {}
-                for _, row in df.iterrows():
-                    address = self._normalize_address(row['address'])
-                    correct_address = row['correct_address']
-                    key = row['key']
-                    self.exceptions[address] = (correct_address, key)
-                
-                print(f"Загруженные исключения: {self.exceptions}")
-            else:
-                print(f"Файл исключений не найден: {self.exceptions_file}")
-        except Exception as e:
-            print(f"Ошибка при загрузке файла исключений: {str(e)}")
-            
-    def get_key(self, address: str) -> tuple[int | None, str]:
-        """Получает ключ для адреса из исключений.
-        
-        Args:
-            address (str): Адрес для поиска.
-            
-        Returns:
-            tuple[int | None, str]: (ключ, сообщение)
-                - Если адрес найден в исключениях, возвращает его ключ и пустое сообщение
-                - Если адрес не найден, возвращает None и сообщение "адрес не найден"
-                - Если адрес найден в исключениях с ключом None, возвращает None и сообщение "адрес не существует"
-        """
-        print(f"Поиск адреса в исключениях: {address}")  # Отладочная информация
-        print(f"Доступные исключения: {self.exceptions}")  # Отладочная информация
-        
-        normalized_address = self._normalize_address(address)
-        print(f"Нормализованный адрес: {normalized_address}")  # Отладочная информация
-        
-        if normalized_address in self.exceptions:
-            correct_address, key = self.exceptions[normalized_address]
-            print(f"Адрес найден в исключениях: correct_address={correct_address}, key={key}")  # Отладочная информация
-            if key is None:
-                return None, "адрес не существует"
-            return key, ""
-        print(f"Адрес не найден в исключениях")  # Отладочная информация
-        return None, "адрес не найден"
-        
-    def get_correct_address(self, address: str) -> str | None:
-        """Получает правильный адрес для адреса из исключений.
-        
-        Args:
-            address (str): Адрес для поиска.
-            
-        Returns:
-            str | None: Правильный адрес или None, если адрес не найден в исключениях
-        """
-        normalized_address = self._normalize_address(address)
-        if normalized_address in self.exceptions:
-            correct_address, _ = self.exceptions[normalized_address]
-            return correct_address
-        return None
-
 class MainWindow(Tk):
     """ Главное окно программы. """
 
@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from ..AddresInfo import Address, StreetType
+
+
+class TestStreetType_fromStr(TestCase):
+
+    def test_prospect(self):
+        for value in ("проспект", "пр-кт", "пркт", "пр"):
+            with self.subTest(value=value):
+                self.assertEqual(StreetType.fromStr(value), StreetType.PROSPECT)
+
+    def test_pereulok(self):
+        for value in ("переулок", "пер", "пер."):
+            with self.subTest(value=value):
+                self.assertEqual(StreetType.fromStr(value), StreetType.PEREULOK)
+
+    def test_proezd(self):
+        for value in ("проезд", "пр-д", "прд"):
+            with self.subTest(value=value):
+                self.assertEqual(StreetType.fromStr(value), StreetType.PROEZD)
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            StreetType.fromStr("Металлургов")
+
+
+class TestAddress_fromStr_street_type(TestCase):
+
+    def test_street_types(self):
+        cases = {
+            "пр Победы 10": ("Победы", StreetType.PROSPECT),
+            "пер Сиреневый 3": ("Сиреневый", StreetType.PEREULOK),
+            "проезд Ударников 5": ("Ударников", StreetType.PROEZD),
+            "пр-д Ударников 5": ("Ударников", StreetType.PROEZD),
+        }
+        for raw, (name, street_type) in cases.items():
+            with self.subTest(raw=raw):
+                addr = Address.fromStr(raw)
+                self.assertEqual(addr.street.name, name)
+                self.assertEqual(addr.street.type, street_type)
+
@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from yargy import or_
+
+from ..Rules import Parser, Tokenizer
+from ..Rules import address_rules
+
+
+class TestMergeKeywordPredicates(TestCase):
+
+    def setUp(self):
+        self.tokenizer = Tokenizer()
+        predicates = (
+            address_rules.ULITSA_PREDICATE,
+            address_rules.SHOSSE_PREDICATE,
+            address_rules.BULVAR_PREDICATE,
+            address_rules.LINIYA_PREDICATE,
+            address_rules.PEREULOK_PREDICATE,
+            address_rules.PROSPECT_PREDICATE,
+            address_rules.PROEZD_PREDICATE,
+            address_rules.PLOSHAD_PREDICATE,
+            address_rules.DOM_WORD,
+            address_rules.KVARTIRA_WORD,
+            address_rules.CITY_WORD,
+            address_rules.CITY_NAME_PREDICATE,
+        )
+
+        class Context:
+            tokenizer = self.tokenizer
+
+        self.merged = address_rules._merge_keyword_predicates(*predicates).activate(Context())
+        self.original = or_(*predicates).activate(Context())
+
+    def test_same_as_original_predicates(self):
+        text = (
+            "пр пер Проезд пр-д улица ул Ленина кв квартира д дом г город Липецк площадь пл "
+            "шоссе ш бульвар б-р линия проспектов Мира Победы улицами Металлургов Сиреневый"
+        )
+        for token in self.tokenizer(text):
+            with self.subTest(token=token.value):
+                self.assertEqual(self.merged(token), self.original(token))
+
+    def test_keywords_not_in_street_name(self):
+        match = Parser().match("улица Металлургов д 2 кв 15")
+        self.assertEqual(match.fact.Street.Name, "Металлургов")
+        self.assertEqual(match.fact.House, "2")
+        self.assertEqual(match.fact.Flat, "15")
+
+    def test_unsupported_predicate(self):
+        with self.assertRaises(TypeError):
+            address_rules._merge_keyword_predicates(address_rules.NOUN)
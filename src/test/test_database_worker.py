@@ -0,0 +1,59 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+
+from sqlalchemy import text
+
+from ..OutputWorker import AddressDTO, DatabaseOutputWorker, LoggersCollection
+
+
+class TestDatabaseWorker_background_write(TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.worker = DatabaseOutputWorker.from_url(
+            f"sqlite:///{self.db_path}", 1, "Input", "Output", "main", "ID", LoggersCollection([io.StringIO()])
+        )
+        self.engine = self.worker.engine
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE TABLE "Input" ("ID" integer, address text, key_street_house integer)'))
+            conn.execute(
+                text('INSERT INTO "Input" ("ID", address) VALUES (:id, :address)'),
+                [{"id": i, "address": f"Адрес {i}"} for i in range(30)],
+            )
+
+        # Порции пишутся потоком записи, как для серверных СУБД
+        self.worker.background_write = True
+        self.worker.CHUNK_SIZE = 10
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.db_path)
+
+    def test_save(self):
+        self.worker.save([AddressDTO(f"Адрес {i}", key=i * 10, ID=i) for i in range(30)])
+
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT COUNT(*) FROM "Output"')).scalar(), 30)
+            keys = dict(conn.execute(text('SELECT "ID", key_street_house FROM "Input"')).all())
+        self.assertEqual(keys, {i: i * 10 for i in range(30)})
+
+    def test_failed_chunk_aborts_save(self):
+        insert_output = self.worker._insert_output
+        calls = []
+
+        def failing_insert(conn, insert_stmt, output_data):
+            calls.append(len(output_data))
+            if len(calls) == 2:
+                raise RuntimeError("ошибка записи")
+            insert_output(conn, insert_stmt, output_data)
+
+        self.worker._insert_output = failing_insert
+        with self.assertRaises(RuntimeError):
+            self.worker.save([AddressDTO(f"Адрес {i}", key=i * 10, ID=i) for i in range(30)])
+
+        # Ключи не обновлены: сохранение прервано до этапа обновления
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT COUNT(key_street_house) FROM "Input"')).scalar(), 0)
@@ -0,0 +1,88 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
+
+from ..OutputWorker import AddressDTO, ImprovedDatabaseOutputWorker, LoggersCollection
+
+
+class TestImprovedWorker_save_sqlite(TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.engine = create_engine(f"sqlite:///{self.db_path}")
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE TABLE "Input" ("ID" integer, address text)'))
+            conn.execute(
+                text('INSERT INTO "Input" VALUES (:id, :address)'),
+                [{"id": i, "address": f" Адрес {i} "} for i in range(30)],
+            )
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.db_path)
+
+    def make_worker(self, id_column):
+        return ImprovedDatabaseOutputWorker(
+            self.engine, "Input", "Output", "main", id_column=id_column, logger=LoggersCollection([io.StringIO()])
+        )
+
+    def keys(self) -> dict:
+        with self.engine.connect() as conn:
+            return dict(conn.execute(text('SELECT "ID", key_street_house FROM "Input"')).all())
+
+    def test_update_keys_by_id(self):
+        # Ключи есть у четных записей; ID приходит строкой, как из Excel
+        addresses = [AddressDTO(f"Адрес {i}", key=i * 10 if i % 2 == 0 else None, ID=str(i)) for i in range(30)]
+        self.make_worker("id").save(addresses)
+
+        self.assertEqual(self.keys(), {i: i * 10 if i % 2 == 0 else None for i in range(30)})
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT COUNT(*) FROM "Output"')).scalar(), 30)
+
+    def test_update_keys_by_address(self):
+        # Адреса сравниваются без учета крайних пробелов
+        addresses = [AddressDTO(f"Адрес {i}", key=i + 100) for i in range(0, 30, 3)]
+        self.make_worker(None).save(addresses)
+
+        self.assertEqual(self.keys(), {i: i + 100 if i % 3 == 0 else None for i in range(30)})
+
+    def test_failed_chunk_keeps_previous_results(self):
+        worker = self.make_worker("id")
+        worker.CHUNK_SIZE = 10
+        worker.save([AddressDTO(f"Адрес {i}", key=i, ID=i) for i in range(10)])
+
+        # Повторное сохранение в режиме дополнения падает на второй порции
+        insert_output = worker._insert_output
+        calls = []
+
+        def failing_insert(conn, output_table, rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise RuntimeError("ошибка записи")
+            insert_output(conn, output_table, rows)
+
+        worker._insert_output = failing_insert
+        with patch("tkinter.messagebox.askyesnocancel", return_value=True):
+            with self.assertRaises(Exception):
+                worker.save([AddressDTO(f"Адрес {i}", key=i + 1000, ID=i) for i in range(30)])
+
+        # Ни строки выходной таблицы, ни ключи первой порции не зафиксированы
+        self.assertEqual(self.keys(), {i: i if i < 10 else None for i in range(30)})
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('SELECT COUNT(*) FROM "Output"')).scalar(), 10)
+
+
+class TestImprovedWorker_expand_address_with_rules(TestCase):
+
+    def test_expansion_applied_once(self):
+        # Оба слова "РОЗЫ ЛЮКСЕМБУРГ" раскрываются в одно и то же полное имя
+        self.assertEqual(ImprovedDatabaseOutputWorker._expand_address_with_rules("ул Розы Люксембург 5"), "РОЗЫ ЛЮКСЕМБУРГ 5")
+        self.assertEqual(ImprovedDatabaseOutputWorker._normalize_address("ул Розы Люксембург 5"), "РОЗЫ ЛЮКСЕМБУРГ 5")
+
+    def test_single_rule(self):
+        self.assertEqual(ImprovedDatabaseOutputWorker._expand_address_with_rules("ул Горького 5"), "МАКСИМА ГОРЬКОГО 5")
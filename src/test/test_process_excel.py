@@ -0,0 +1,71 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# main и gui импортируют друг друга, поэтому main загружается через gui
+from .. import gui  # noqa: F401
+import main
+from ..Linker import Linker
+from ..OutputWorker import AddressDTO, LoggersCollection
+
+
+class TestProcessExcel_repeated_addresses(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.linker = Linker.load(pd.read_excel("./DB_EXPORT.xlsx", "Sheet 1"))
+
+    def setUp(self):
+        fd, self.input_path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        fd, self.output_path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+
+        self.raw = ["ул Металлургов 2", "абв", "ул Металлургов 2", None, "пркт советский 57", "абв", "ул Металлургов 2"]
+        pd.DataFrame({"address": self.raw, "id": range(len(self.raw))}).to_excel(self.input_path, index=False)
+
+        self.patches = [
+            patch.object(main, "linker", self.linker),
+            patch.object(main, "logger", LoggersCollection([io.StringIO()]), create=True),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        os.remove(self.input_path)
+        os.remove(self.output_path)
+
+    def run_process_excel(self) -> tuple[main.ProcessingStats, list[tuple]]:
+        stats = main.process_excel(self.input_path, 0, "address", self.output_path, "id")
+        rows = list(load_workbook(self.output_path).active.iter_rows(values_only=True))
+        return stats, rows
+
+    def test_each_address_processed_once(self):
+        with patch.object(main, "process", wraps=main.process) as process:
+            stats, rows = self.run_process_excel()
+
+        # Пустой адрес не кэшируется, остальные разбираются по одному разу
+        self.assertEqual(process.call_count, 4)
+
+        # Результат и статистика считаются по строкам входного файла
+        self.assertEqual([row[-1] for row in rows[1:]], list(range(len(self.raw))))
+        self.assertEqual([row[0] for row in rows[1:]], self.raw)
+        self.assertEqual(stats.successful + stats.unprocessed + stats.unparsed, len(self.raw))
+        keys = [row[5] for row in rows[1:]]
+        self.assertIsNotNone(keys[0])
+        self.assertEqual(keys[0], keys[2])
+        self.assertEqual(keys[0], keys[6])
+
+    def test_same_result_as_processing_every_row(self):
+        _, rows = self.run_process_excel()
+
+        raw_values = pd.read_excel(self.input_path)["address"].tolist()
+        expected = [tuple(AddressDTO(raw, *main.process(raw)[:2]).to_row()[1:]) for raw in raw_values]
+        self.assertEqual([row[1:6] for row in rows[1:]], expected)
@@ -0,0 +1,83 @@
+import io
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from openpyxl import load_workbook
+
+from ..AddresInfo import Address
+from ..OutputWorker import AddressDTO, LoggersCollection, RawXMLExcelOutputWorker
+from ..OutputWorker.xlsx_writer import XLSXStreamWriter
+
+
+class TestXLSXStreamWriter(TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def read(self) -> tuple[str, list[tuple]]:
+        workbook = load_workbook(self.path)
+        sheet = workbook.active
+        return sheet.title, list(sheet.iter_rows(values_only=True))
+
+    def test_round_trip(self):
+        header = ["Текст", "Целое", "Дробное", "Логическое"]
+        rows = [
+            ("ул Металлургов 2", 1, 1.5, True),
+            ("<a & b> \"c\" 'd'", np.int64(2), np.float64(-0.25), False),
+            ("  пробелы  ", 10**12, 3.0, None),
+        ]
+        XLSXStreamWriter(self.path).write(header, rows)
+
+        self.assertEqual(self.read(), ("Sheet1", [tuple(header), *rows]))
+
+    def test_empty_values(self):
+        # None, NaN и бесконечности записываются пустыми ячейками
+        XLSXStreamWriter(self.path).write(["A", "B", "C"], [(None, float("nan"), "x"), (np.nan, float("inf"), "y")])
+
+        self.assertEqual(self.read()[1], [("A", "B", "C"), (None, None, "x"), (None, None, "y")])
+
+    def test_illegal_xml_characters(self):
+        # Управляющие символы, недопустимые в XML, удаляются
+        XLSXStreamWriter(self.path).write(["A"], [("a\x00b\x1fc\td",)])
+
+        self.assertEqual(self.read()[1][1], ("abc\td",))
+
+    def test_sheet_name_escaping(self):
+        XLSXStreamWriter(self.path, sheet_name='Адреса & "ключи"').write(["A"], [])
+
+        self.assertEqual(self.read(), ('Адреса & "ключи"', [("A",)]))
+
+    def test_other_types_as_text(self):
+        XLSXStreamWriter(self.path).write(["A"], [(Address.fromStr("ул Металлургов 2"),)])
+
+        self.assertIsInstance(self.read()[1][1][0], str)
+
+
+class TestRawXMLExcelOutputWorker(TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_save(self):
+        addresses = [
+            AddressDTO("ул Металлургов 2", Address.fromStr("ул Металлургов 2"), 15, ID=1),
+            AddressDTO("нет адреса", None, None, note="Адрес не разобран", ID=2),
+        ]
+        RawXMLExcelOutputWorker(self.path, LoggersCollection([io.StringIO()])).save(addresses)
+
+        rows = list(load_workbook(self.path).active.iter_rows(values_only=True))
+        self.assertEqual(rows, [
+            (*AddressDTO.COLUMNS, "Note", "ID"),
+            ("ул Металлургов 2", "Металлургов", "УЛ.", "2", None, 15, None, 1),
+            ("нет адреса", None, None, None, None, None, "Адрес не разобран", 2),
+        ])